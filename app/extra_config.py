@@ -8,12 +8,20 @@ ADMIN_STATUS = {ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER}
 
 BOT_NAME = getenv("BOT_NAME", "PLAIN-UB")
 
+BULK_UPLOAD_CONCURRENCY: int = max(int(getenv("BULK_UPLOAD_CONCURRENCY", 3)), 1)
+
 CUSTOM_PACK_NAME = getenv("CUSTOM_PACK_NAME")
 
 DISABLED_SUPERUSERS: list[int] = []
 
+FBAN_CONCURRENCY: int = max(int(getenv("FBAN_CONCURRENCY", 10)), 1)
+
 FBAN_LOG_CHANNEL: int = int(getenv("FBAN_LOG_CHANNEL") or getenv("LOG_CHAT"))
 
+FBAN_RETRIES: int = int(getenv("FBAN_RETRIES", 2))
+
+FBAN_SKIP_AFTER: int = int(getenv("FBAN_SKIP_AFTER", 3))
+
 FBAN_SUDO_ID: int = int(getenv("FBAN_SUDO_ID", 0))
 
 FBAN_SUDO_TRIGGER: str = getenv("FBAN_SUDO_TRIGGER")
@@ -22,10 +30,18 @@ GEMINI_API_KEY: str = getenv("GEMINI_API_KEY")
 
 LOAD_HANDLERS: bool = True
 
+MESSAGE_LOGGER_CACHE_LIMIT: int = max(int(getenv("MESSAGE_LOGGER_CACHE_LIMIT", 50)), 1)
+
 MESSAGE_LOGGER_CHAT: int = int(getenv("MESSAGE_LOGGER_CHAT") or getenv("LOG_CHAT"))
 
+MESSAGE_LOGGER_OVERFLOW_LIMIT: int = int(getenv("MESSAGE_LOGGER_OVERFLOW_LIMIT", 5000))
+
 PM_GUARD: bool = False
 
+PM_GUARD_SPAM_THRESHOLD: int = max(int(getenv("PM_GUARD_SPAM_THRESHOLD", 5)), 1)
+
+PM_GUARD_SPAM_WINDOW: int = int(getenv("PM_GUARD_SPAM_WINDOW", 3600))
+
 PM_LOGGER: bool = False
 
 PM_LOGGER_THREAD_ID: int = int(getenv("PM_LOGGER_THREAD_ID", 0)) or None
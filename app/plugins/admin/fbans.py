@@ -1,31 +1,135 @@
 import asyncio
+import re
+import statistics
+import time
+from collections import defaultdict, deque
 
 from pyrogram import filters
 from pyrogram.enums import ChatType
-from pyrogram.errors import UserNotParticipant
+from pyrogram.errors import FloodWait, UserNotParticipant
 from pyrogram.types import Chat, User
 from ub_core.utils.helpers import get_name
 
 from app import BOT, Config, CustomDB, Message, bot, extra_config
 
-FBAN_TASK_LOCK = asyncio.Lock()
-
 FED_DB = CustomDB["FED_LIST"]
 
+# chat id -> fed doc, mirrors FED_DB.
+FED_CACHE: dict[int, dict] = {}
+
+FBAN_JOBS_DB = CustomDB["FBAN_JOBS"]
+
+# Pending fed jobs in order, the first one is the one running.
+FED_JOB_QUEUE: list[dict] = []
+
+FED_JOB_EVENT = asyncio.Event()
+
+# Seconds the last few jobs took, for queue ETAs.
+FED_JOB_DURATIONS: deque[float] = deque(maxlen=10)
+
+# Only the first few waiting jobs get their queue position refreshed after each job,
+# the rest are updated as they move up, keeping edits per job constant.
+QUEUE_STATUS_REFRESH_LIMIT = 5
+
 BASIC_FILTER = filters.user([609517172, 2059887769, 1376954911, 885745757]) & ~filters.service
 
-FBAN_REGEX = BASIC_FILTER & filters.regex(
-    r"(New FedBan|"
+# One pass over a fed bot's reply tells both whether it is a confirmation and of which kind.
+FED_RESPONSE_REGEX = re.compile(
+    r"(?P<fban>New FedBan|"
     r"starting a federation ban|"
     r"Starting a federation ban|"
     r"start a federation ban|"
     r"FedBan Reason update|"
     r"FedBan reason updated|"
     r"Would you like to update this reason)"
+    r"|(?P<unfban>New un-FedBan|I'll give|Un-FedBan)"
 )
 
+TASK_RESPONSE_GROUPS = {"Fban": "fban", "Un-FBan": "unfban"}
+
+USER_ID_REGEX = re.compile(r"\b\d{5,}\b")
+
+# (fed chat id, target user id) -> (expected response group, future for the reply).
+PENDING_FED_RESPONSES: dict[tuple[int, int], tuple[str, asyncio.Future]] = {}
+
+# fed chat id -> target user ids with a pending response in that chat.
+PENDING_FED_CHATS: dict[int, set[int]] = defaultdict(set)
+
+
+class FedPacer:
+    """Spaces out commands sent to the same fed chat and pauses all sends during a FloodWait."""
+
+    def __init__(self, gap: float = 1):
+        self.gap = gap
+        self.last_sent: dict[int, float] = {}
+        self.flood_until: float = 0
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        ready = max(self.flood_until, self.last_sent.get(chat_id, 0) + self.gap, now)
+        self.last_sent[chat_id] = ready
+        await asyncio.sleep(ready - now)
+
+    def flood_wait(self, seconds: int):
+        self.flood_until = max(self.flood_until, time.monotonic() + seconds)
+
+
+FED_PACER = FedPacer()
+
+
+class FedHealth:
+    """Response stats of a fed chat, used to order and skip feds during a fan-out."""
+
+    # Seconds a failing fed is skipped for before it is tried again.
+    SKIP_COOLDOWN = 3600
+
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.failure_streak = 0
+        self.last_failure: float | None = None
+        self.latencies: deque[float] = deque(maxlen=20)
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts else 1
+
+    @property
+    def median_latency(self) -> float:
+        return statistics.median(self.latencies) if self.latencies else 0
 
-UNFBAN_REGEX = BASIC_FILTER & filters.regex(r"(New un-FedBan|I'll give|Un-FedBan)")
+    @property
+    def is_failing(self) -> bool:
+        return (
+            bool(extra_config.FBAN_SKIP_AFTER)
+            and self.failure_streak >= extra_config.FBAN_SKIP_AFTER
+            and time.time() - self.last_failure < self.SKIP_COOLDOWN
+        )
+
+    def record(self, success: bool, latency: float | None = None):
+        self.attempts += 1
+        if success:
+            self.successes += 1
+            self.failure_streak = 0
+            self.latencies.append(latency)
+        else:
+            self.failure_streak += 1
+            self.last_failure = time.time()
+
+
+FED_HEALTH: dict[int, FedHealth] = defaultdict(FedHealth)
+
+
+async def init_task():
+    async for fed in FED_DB.find():
+        FED_CACHE[int(fed["_id"])] = fed
+
+    async for job in FBAN_JOBS_DB.find():
+        FED_JOB_QUEUE.append(job)
+
+    FED_JOB_QUEUE.sort(key=lambda job: job["created"])
+    FED_JOB_EVENT.set()
+    Config.BACKGROUND_TASKS.append(asyncio.create_task(fed_job_runner(), name="fed_job_runner"))
 
 
 @bot.add_cmd(cmd="addf")
@@ -38,6 +142,7 @@ async def add_fed(bot: BOT, message: Message):
     """
     data = dict(name=message.input or message.chat.title, type=str(message.chat.type))
     await FED_DB.add_data({"_id": message.chat.id, **data})
+    FED_CACHE[message.chat.id] = {"_id": message.chat.id, **data}
     text = f"#FBANS\n<b>{data['name']}</b>: <code>{message.chat.id}</code> added to FED LIST."
     await message.reply(text=text, del_in=5, block=True)
     await bot.log_text(text=text, type="info")
@@ -54,6 +159,8 @@ async def remove_fed(bot: BOT, message: Message):
     """
     if "-all" in message.flags:
         await FED_DB.drop()
+        FED_CACHE.clear()
+        FED_HEALTH.clear()
         await message.reply("FED LIST cleared.")
         return
 
@@ -67,6 +174,8 @@ async def remove_fed(bot: BOT, message: Message):
         chat = int(chat)
 
     deleted: int = await FED_DB.delete_data(id=chat)
+    FED_CACHE.pop(chat, None)
+    FED_HEALTH.pop(chat, None)
 
     if deleted:
         text = f"#FBANS\n<b>{name}</b><code>{chat}</code> removed from FED LIST."
@@ -81,17 +190,27 @@ async def fed_list(bot: BOT, message: Message):
     """
     CMD: LISTF
     INFO: View Connected Feds.
-    FLAGS: -id to list Fed Chat IDs.
-    USAGE: .listf | .listf -id
+    FLAGS:
+        -id to list Fed Chat IDs.
+        -s to show response stats.
+    USAGE: .listf | .listf -id | .listf -s
     """
     output: str = ""
     total = 0
 
-    async for fed in FED_DB.find():
+    for chat_id, fed in FED_CACHE.items():
         output += f'<b>• {fed["name"]}</b>\n'
 
         if "-id" in message.flags:
-            output += f'  <code>{fed["_id"]}</code>\n'
+            output += f"  <code>{chat_id}</code>\n"
+
+        if "-s" in message.flags and chat_id in FED_HEALTH:
+            health = FED_HEALTH[chat_id]
+            output += (
+                f"  {health.success_rate:.0%} of {health.attempts}"
+                f" | {health.median_latency:.1f}s"
+                f"{' | skipped' if health.is_failing else ''}\n"
+            )
 
         total += 1
 
@@ -151,11 +270,10 @@ async def fed_ban(bot: BOT, message: Message):
 
     fban_cmd: str = f"/fban <a href='tg://user?id={user_id}'>{user_id}</a> {reason}"
 
-    await perform_fed_task(
+    await queue_fed_task(
         user_id=user_id,
         user_mention=user_mention,
         command=fban_cmd,
-        task_filter=FBAN_REGEX,
         task_type="Fban",
         reason=reason,
         progress=progress,
@@ -184,11 +302,10 @@ async def un_fban(bot: BOT, message: Message):
     user_id, user_mention, reason = extracted_info
     unfban_cmd: str = f"/unfban <a href='tg://user?id={user_id}'>{user_id}</a> {reason}"
 
-    await perform_fed_task(
+    await queue_fed_task(
         user_id=user_id,
         user_mention=user_mention,
         command=unfban_cmd,
-        task_filter=UNFBAN_REGEX,
         task_type="Un-FBan",
         reason=reason,
         progress=progress,
@@ -210,82 +327,320 @@ async def get_user_reason(message: Message, progress: Message) -> tuple[int, str
     return user_id, user_mention, reason
 
 
-async def perform_fed_task(*args, **kwargs):
-    async with FBAN_TASK_LOCK:
-        await _perform_fed_task(*args, **kwargs)
-
-
-async def _perform_fed_task(
+async def queue_fed_task(
     user_id: int,
     user_mention: str,
     command: str,
-    task_filter: filters.Filter,
     task_type: str,
     reason: str,
     progress: Message,
     message: Message,
 ):
-    await progress.edit("❯❯")
+    """
+    Add a fed task to the persistent job queue.
 
-    total: int = 0
-    failed: list[str] = []
+    A task for a user who already has the same task waiting in the queue
+    is merged into that job, the newer command and reason win.
+    """
+    for job in FED_JOB_QUEUE[1:]:
+        if job["user_id"] == user_id and job["task_type"] == task_type:
+            job.update(command=command, reason=reason)
+            await FBAN_JOBS_DB.add_data(job)
+            await progress.edit(
+                f"Merged with the queued {task_type} of {user_mention}.", del_in=10, block=False
+            )
+            return
 
-    async for fed in FED_DB.find():
-        chat_id = int(fed["_id"])
-        total += 1
+    job = {
+        "_id": f"{progress.chat.id}-{progress.id}",
+        "created": time.time(),
+        "user_id": user_id,
+        "user_mention": user_mention,
+        "command": command,
+        "task_type": task_type,
+        "reason": reason,
+        "progress_chat_id": progress.chat.id,
+        "progress_id": progress.id,
+        "initiated_in": message.chat.title or "PM",
+        "by_id": message.from_user.id,
+        "by_name": get_name(message.from_user),
+        "is_from_owner": message.is_from_owner,
+        "no_recurse": "-nrc" in message.flags,
+    }
+    FED_JOB_QUEUE.append(job)
+    await FBAN_JOBS_DB.add_data(job)
+    FED_JOB_EVENT.set()
+
+    if len(FED_JOB_QUEUE) > 1:
+        await progress.edit(queue_status(len(FED_JOB_QUEUE) - 1))
+
+
+def queue_status(position: int) -> str:
+    feds_eta = sum(FED_JOB_DURATIONS) / len(FED_JOB_DURATIONS) if FED_JOB_DURATIONS else 10
+    return f"❯ Queued at position <b>{position}</b>, ETA: ~{int(position * feds_eta)}s"
+
+
+async def get_job_progress(job: dict) -> Message | None:
+    try:
+        progress = await bot.get_messages(
+            chat_id=job["progress_chat_id"], message_ids=job["progress_id"]
+        )
+    except Exception:
+        return None
+    if not progress or progress.empty:
+        return None
+    return Message(message=progress)
+
+
+async def fed_job_runner():
+    """Run queued fed jobs one at a time, jobs left over from a restart run first."""
+    while True:
+        if not FED_JOB_QUEUE:
+            FED_JOB_EVENT.clear()
+            await FED_JOB_EVENT.wait()
+            continue
 
-        try:
-            cmd: Message = await bot.send_message(
-                chat_id=chat_id, text=command, disable_preview=True
-            )
-            response: Message | None = await cmd.get_response(filters=task_filter, timeout=8)
-            if not response:
-                failed.append(fed["name"])
-            elif "Would you like to update this reason" in response.text:
-                await response.click("Update reason")
+        job = FED_JOB_QUEUE[0]
+        start = time.monotonic()
 
+        try:
+            await _perform_fed_task(job=job, progress=await get_job_progress(job))
         except Exception as e:
             await bot.log_text(
-                text=f"An Error occured while banning in fed: {fed['name']} [{chat_id}]"
-                f"\nError: {e}",
-                type=task_type.upper(),
+                text=f"#{job['task_type'].upper()}\nJob for {job['user_id']} failed: {e}",
+                type="error",
             )
-            failed.append(fed["name"])
+
+        FED_JOB_DURATIONS.append(time.monotonic() - start)
+        FED_JOB_QUEUE.pop(0)
+
+        try:
+            await FBAN_JOBS_DB.delete_data(id=job["_id"])
+        except Exception as e:
+            await bot.log_text(text=f"Couldn't remove finished fed job from DB: {e}", type="error")
+
+        await refresh_queue_status()
+
+
+async def refresh_queue_status():
+    """Update the queue position of the next few waiting jobs, best effort."""
+    waiting_jobs = FED_JOB_QUEUE[1 : QUEUE_STATUS_REFRESH_LIMIT + 1]
+    for position, waiting_job in enumerate(waiting_jobs, start=1):
+        try:
+            if waiting_progress := await get_job_progress(waiting_job):
+                await waiting_progress.edit(queue_status(position))
+        except FloodWait:
+            # Positions are cosmetic, not worth holding up the next job.
+            return
+        except Exception:
             continue
 
-        await asyncio.sleep(1)
+
+async def _perform_fed_task(job: dict, progress: Message | None):
+    user_id = job["user_id"]
+    user_mention = job["user_mention"]
+    command = job["command"]
+    task_type = job["task_type"]
+    reason = job["reason"]
+
+    if progress:
+        await progress.edit("❯❯")
+
+    feds: list[dict] = []
+    skipped: list[str] = []
+
+    for chat_id, fed in FED_CACHE.items():
+        if FED_HEALTH[chat_id].is_failing:
+            skipped.append(fed["name"])
+        else:
+            feds.append(fed)
+
+    # Healthy, fast feds get the first semaphore slots.
+    feds.sort(
+        key=lambda fed: (
+            FED_HEALTH[int(fed["_id"])].failure_streak,
+            FED_HEALTH[int(fed["_id"])].median_latency,
+        )
+    )
+    total: int = len(feds) + len(skipped)
+
+    semaphore = asyncio.Semaphore(extra_config.FBAN_CONCURRENCY)
+    results: list[bool] = await asyncio.gather(
+        *(
+            fed_task_worker(
+                fed=fed,
+                command=command,
+                user_id=user_id,
+                task_type=task_type,
+                semaphore=semaphore,
+            )
+            for fed in feds
+        )
+    )
+    failed: list[str] = [fed["name"] for fed, success in zip(feds, results) if not success]
 
     if not total:
-        await progress.edit("You Don't have any feds connected!")
+        if progress:
+            await progress.edit("You Don't have any feds connected!")
         return
 
     resp_str = (
         f"❯❯❯ <b>{task_type}ned</b> {user_mention}"
         f"\n<b>ID</b>: {user_id}"
         f"\n<b>Reason</b>: {reason}"
-        f"\n<b>Initiated in</b>: {message.chat.title or 'PM'}"
+        f"\n<b>Initiated in</b>: {job['initiated_in']}"
     )
 
+    if skipped:
+        resp_str += f"\n<b>Skipped</b> in: {len(skipped)}/{total}\n• " + "\n• ".join(skipped)
+
     if failed:
         resp_str += f"\n<b>Failed</b> in: {len(failed)}/{total}\n• " + "\n• ".join(failed)
-    else:
+    elif not skipped:
         resp_str += f"\n<b>Status</b>: {task_type}ned in <b>{total}</b> feds."
         
-        resp_str += f"\n<b>{task_type}ned by</b>: <a href='tg://user?id={message.from_user.id}'>{get_name(message.from_user)}</a>"
+        resp_str += f"\n<b>{task_type}ned by</b>: <a href='tg://user?id={job['by_id']}'>{job['by_name']}</a>"
 
-    if not message.is_from_owner:
-        resp_str += f"\n\n<b>By</b>: {get_name(message.from_user)}"
+    if not job["is_from_owner"]:
+        resp_str += f"\n\n<b>By</b>: {job['by_name']}"
 
     await bot.send_message(
         chat_id=extra_config.FBAN_LOG_CHANNEL, text=resp_str, disable_preview=True
     )
 
-    await progress.edit(text=resp_str, del_in=55, block=True, disable_preview=True)
+    if progress:
+        await progress.edit(text=resp_str, del_in=55, block=False, disable_preview=True)
 
-    if "-nrc" not in message.flags:
+    if not job["no_recurse"]:
         await handle_sudo_fban(command=command)
 
 
+async def fed_task_worker(
+    fed: dict,
+    command: str,
+    user_id: int,
+    task_type: str,
+    semaphore: asyncio.Semaphore,
+) -> bool:
+    """
+    Send the fed command in a fed chat and wait for the fed bot to confirm it.
+    Retries up to FBAN_RETRIES times if the bot doesn't respond or the send fails.
+
+    :return: True if the fed bot confirmed the action.
+    """
+    chat_id = int(fed["_id"])
+    error: Exception | None = None
+
+    async with semaphore:
+        for _ in range(extra_config.FBAN_RETRIES + 1):
+            await FED_PACER.wait(chat_id)
+
+            try:
+                sent_at = time.monotonic()
+                response: Message | None = await send_and_wait_for_response(
+                    chat_id=chat_id,
+                    user_id=user_id,
+                    command=command,
+                    response_group=TASK_RESPONSE_GROUPS[task_type],
+                )
+
+                if response:
+                    FED_HEALTH[chat_id].record(success=True, latency=time.monotonic() - sent_at)
+                    if "Would you like to update this reason" in response.text:
+                        await update_reason(response, fed)
+                    return True
+
+            except FloodWait as e:
+                FED_PACER.flood_wait(e.value)
+                error = e
+
+            except Exception as e:
+                error = e
+
+    FED_HEALTH[chat_id].record(success=False)
+
+    if error:
+        await bot.log_text(
+            text=f"An Error occured while banning in fed: {fed['name']} [{chat_id}]"
+            f"\nError: {error}",
+            type=task_type.upper(),
+        )
+    return False
+
+
+async def update_reason(response: Message, fed: dict):
+    """The action is already confirmed, a failed click only leaves the old reason."""
+    try:
+        await response.click("Update reason")
+    except Exception as e:
+        await bot.log_text(text=f"Couldn't update the reason in {fed['name']}: {e}", type="error")
+
+
+async def send_and_wait_for_response(
+    chat_id: int, user_id: int, command: str, response_group: str, timeout: float = 8
+) -> Message | None:
+    """
+    Send the fed command and wait for fed_response_dispatcher to hand over the bot's reply.
+
+    :param response_group: FED_RESPONSE_REGEX group the reply has to match.
+    :return: The fed bot's reply or None if it didn't respond in time.
+    """
+    key = (chat_id, user_id)
+    future = asyncio.get_running_loop().create_future()
+    PENDING_FED_RESPONSES[key] = (response_group, future)
+    PENDING_FED_CHATS[chat_id].add(user_id)
+
+    try:
+        await bot.send_message(chat_id=chat_id, text=command, disable_preview=True)
+        return await asyncio.wait_for(future, timeout=timeout)
+    except TimeoutError:
+        return None
+    finally:
+        PENDING_FED_RESPONSES.pop(key, None)
+        PENDING_FED_CHATS[chat_id].discard(user_id)
+        if not PENDING_FED_CHATS[chat_id]:
+            PENDING_FED_CHATS.pop(chat_id, None)
+
+
+@bot.on_message(
+    filters=BASIC_FILTER
+    & (filters.text | filters.caption)
+    & filters.create(lambda _, __, m: m.chat.id in PENDING_FED_CHATS),
+    group=3,
+)
+async def fed_response_dispatcher(bot: BOT, message: Message):
+    """Single listener for every in-flight fed command, instead of one conversation per fed."""
+    chat_id = message.chat.id
+    pending_user_ids = PENDING_FED_CHATS.get(chat_id)
+    if not pending_user_ids:
+        return
+
+    text = message.text or message.caption or ""
+    match = FED_RESPONSE_REGEX.search(text)
+    if not match:
+        return
+
+    # Bots refer to the target as a text mention, a tg://user?id= link or the raw id.
+    candidates: set[int] = {int(user_id) for user_id in USER_ID_REGEX.findall(text)}
+    for entity in message.entities or message.caption_entities or []:
+        if entity.user:
+            candidates.add(entity.user.id)
+        elif entity.url:
+            candidates.update(int(user_id) for user_id in USER_ID_REGEX.findall(entity.url))
+
+    matched = pending_user_ids & candidates
+
+    # Nothing identifies the target, only safe to match if one request is pending.
+    # A reply naming someone else is never ours.
+    if not candidates and len(pending_user_ids) == 1:
+        matched = set(pending_user_ids)
+
+    for user_id in matched:
+        response_group, future = PENDING_FED_RESPONSES.get((chat_id, user_id), (None, None))
+        if future and response_group == match.lastgroup and not future.done():
+            future.set_result(message)
+
+
 async def handle_sudo_fban(command: str):
     if not (extra_config.FBAN_SUDO_ID and extra_config.FBAN_SUDO_TRIGGER):
         return
@@ -1,19 +1,28 @@
 ﻿import asyncio
+import glob
+import hashlib
 import json
 import os
+import re
+import time
 from collections import defaultdict
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
 from functools import wraps
+from pathlib import Path
 
 import aiohttp
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from pyrogram.enums import ParseMode
 from ub_core import BOT, Config, CustomDB, Message, bot
-from ub_core.utils import Download, get_tg_media_details, progress
+from ub_core.utils import Download, DownloadedFile, get_tg_media_details, progress
+
+from app.plugins.files.upload import STREAM_TIMEOUT, size_over_limit, stream_to_tg
 
 DB = CustomDB["COMMON_SETTINGS"]
+# source key (tg:<file_unique_id> | url:<url> | md5:<checksum>) -> uploaded drive file.
+DEDUP_DB = CustomDB["DRIVE_UPLOADS"]
 
 INSTRUCTIONS = """
 Gdrive Credentials and Access token not found!
@@ -32,19 +41,330 @@ Gdrive Credentials and Access token not found!
 - Upload this file to your saved messages and reply to it with .gsetup
 """
 
+FILE_ID_REGEX = re.compile(r"(?:/d/|/folders/|[?&]id=)([\w-]{20,})|^([\w-]{20,})$")
+
+# Size of the chunks pyrogram's stream_media seeks in.
+TG_STREAM_CHUNK_SIZE = 1048576
+
+
+class DriveHTTPError(Exception):
+    def __init__(self, status: int, text: str):
+        super().__init__(text)
+        self.status = status
+
+
+def extract_file_id(link: str) -> str | None:
+    """
+    :param link: A Drive share link or a raw file id.
+    """
+    match = FILE_ID_REGEX.search(link.strip())
+    return match and (match.group(1) or match.group(2))
+
+
+def safe_file_name(name: str, fallback: str) -> str:
+    """
+    :param name: A Drive file name, which may contain slashes or be '..'.
+    :return: A name that stays inside the download dir, fallback if nothing usable is left.
+    """
+    name = os.path.basename(name.replace("/", "_").replace("\\", "_"))
+    if name in ("", ".", ".."):
+        return fallback
+    return name
+
+
+def md5_file(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as file:
+        while data := file.read(TG_STREAM_CHUNK_SIZE):
+            md5.update(data)
+    return md5.hexdigest()
+
+
+async def read_file(path: str, offset: int = 0) -> AsyncIterator[bytes]:
+    """Read a local file from offset without blocking the event loop."""
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while data := await asyncio.to_thread(file.read, TG_STREAM_CHUNK_SIZE):
+            yield data
+
+
+async def skip_bytes(source: AsyncIterator[bytes], count: int) -> AsyncIterator[bytes]:
+    """Drop the first count bytes of an async byte stream."""
+    async for data in source:
+        if count >= len(data):
+            count -= len(data)
+            continue
+        if count:
+            data = memoryview(data)[count:]
+            count = 0
+        yield data
+
+
+class ChunkBuffer:
+    """
+    A re-usable chunk that is filled in place.
+
+    Incoming data is copied exactly once into the pre-allocated bytearray
+    and the filled part is handed out as a memoryview, so assembling
+    a chunk never re-allocates or copies the rest of the stream.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.filled = 0
+        self._data = bytearray(size)
+        self._view = memoryview(self._data)
+
+    @property
+    def is_full(self) -> bool:
+        return self.filled == self.size
+
+    @property
+    def chunk(self) -> memoryview:
+        return self._view[: self.filled]
+
+    def fill(self, data: memoryview) -> memoryview:
+        """
+        :param data: bytes to copy into the free space of the chunk.
+        :return: The part of data that did not fit.
+        """
+        take = min(self.size - self.filled, len(data))
+        self._view[self.filled : self.filled + take] = data[:take]
+        self.filled += take
+        return data[take:]
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def reset(self, size: int | None = None):
+        """
+        :param size: New chunk size, the backing buffer only grows when it is too small.
+        """
+        self.filled = 0
+
+        if size is None:
+            return
+
+        if size > len(self._data):
+            self._view.release()
+            self._data = bytearray(size)
+            self._view = memoryview(self._data)
+
+        self.size = size
+
+
+class BufferPool:
+    """
+    The ChunkBuffers of one upload, kept under limit bytes of backing memory in total.
+
+    As chunks grow, idle buffers are dropped instead of grown,
+    so the read-ahead depth shrinks and the memory used stays the same.
+    """
+
+    def __init__(self, count: int, size: int, limit: int, alignment: int):
+        self.limit = limit
+        self.alignment = alignment
+        self.count = max(min(count, limit // size), 1)
+        self.allocated = self.count * size
+        self.free: asyncio.Queue[ChunkBuffer] = asyncio.Queue()
+        for _ in range(self.count):
+            self.free.put_nowait(ChunkBuffer(size))
+
+    async def get(self, size: int) -> ChunkBuffer:
+        buffer = await self.free.get()
+        grow = max(size - buffer.capacity, 0)
+
+        while self.allocated + grow > self.limit and not self.free.empty():
+            self.allocated -= self.free.get_nowait().capacity
+            self.count -= 1
+
+        # The rest are busy, grow only as far as the limit allows.
+        if self.allocated + grow > self.limit:
+            room = (
+                (self.limit - self.allocated + buffer.capacity) // self.alignment * self.alignment
+            )
+            size = max(buffer.capacity, room)
+            grow = size - buffer.capacity
+
+        buffer.reset(size)
+        self.allocated += grow
+        return buffer
+
+    def put(self, buffer: ChunkBuffer):
+        self.free.put_nowait(buffer)
+
+
+class ChunkSizer:
+    """
+    Picks the size of the next chunk from the measured PUT throughput.
+
+    Starts at the configured chunk size and aims for each PUT to take
+    about TARGET_SECONDS, changing at most 2x per chunk.
+    Sizes are always a multiple of the Drive chunk alignment.
+    """
+
+    TARGET_SECONDS = 4
+
+    def __init__(self, initial: int, ceiling: int, alignment: int):
+        self.alignment = alignment
+        self.ceiling = max(ceiling // alignment, 1) * alignment
+        self.size = min(initial, self.ceiling)
+
+    def record(self, size: int, seconds: float):
+        """
+        :param size: bytes sent in a full chunk.
+        :param seconds: time the PUT took.
+        """
+        wanted = size / max(seconds, 0.001) * self.TARGET_SECONDS
+        wanted = min(max(wanted, self.size / 2), self.size * 2)
+        aligned = int(wanted) // self.alignment * self.alignment
+        self.size = min(max(aligned, self.alignment), self.ceiling)
+
+
+class DriveIndex:
+    """
+    In-memory metadata of the Drive tree.
+
+    Built once with a full files.list and kept current with changes.list,
+    so listings, searches and path lookups don't need an API call.
+    """
+
+    FIELDS = "id, name, parents, mimeType, size, modifiedTime, shortcutDetails, trashed"
+
+    def __init__(self):
+        self.files: dict[str, dict] = {}
+        self.children: dict[str, set[str]] = defaultdict(set)
+        self._lower_names: dict[str, str] = {}
+        self.root_id: str | None = None
+        self.page_token: str | None = None
+        self.is_ready = False
+
+    def clear(self):
+        self.files.clear()
+        self.children.clear()
+        self._lower_names.clear()
+        self.root_id = None
+        self.page_token = None
+        self.is_ready = False
+
+    def add(self, file: dict):
+        if file.get("trashed"):
+            self.remove(file["id"])
+            return
+
+        self.remove(file["id"])
+        self.files[file["id"]] = file
+        self._lower_names[file["id"]] = file["name"].lower()
+
+        for parent in file.get("parents", []):
+            self.children[parent].add(file["id"])
+
+    def remove(self, file_id: str):
+        file = self.files.pop(file_id, None)
+        self._lower_names.pop(file_id, None)
+
+        if not file:
+            return
+
+        for parent in file.get("parents", []):
+            self.children[parent].discard(file_id)
+
+    def query(
+        self,
+        parent_id: str | None = None,
+        name: str | None = None,
+        file_only: bool = False,
+        folder_only: bool = False,
+        limit: int = 10,
+    ) -> list[dict]:
+        """
+        :param parent_id: Only return direct children of this folder.
+        :param name: Only return files whose name contains this (case-insensitive).
+        :return: Up to limit matching files.
+        """
+        if parent_id is not None:
+            file_ids = self.children.get(parent_id, ())
+        else:
+            file_ids = self.files
+
+        if name is not None:
+            name = name.lower()
+
+        results = []
+
+        for file_id in file_ids:
+            file = self.files[file_id]
+            is_folder = file["mimeType"] == Drive.FOLDER_MIME
+
+            if (folder_only and not is_folder) or (file_only and is_folder):
+                continue
+
+            if name is not None and name not in self._lower_names[file_id]:
+                continue
+
+            results.append(file)
+
+            if len(results) >= limit:
+                break
+
+        return results
+
+    def resolve_path(self, path: str, root_id: str | None = None) -> str | None:
+        """
+        :param path: / separated folder names, relative to root_id.
+        :return: ID of the last folder in the path or None if it doesn't exist.
+        """
+        folder_id = root_id or self.root_id
+
+        for part in filter(None, path.split("/")):
+            for child_id in self.children.get(folder_id, ()):
+                child = self.files[child_id]
+                if child["name"] == part and child["mimeType"] == Drive.FOLDER_MIME:
+                    folder_id = child_id
+                    break
+            else:
+                return None
+
+        return folder_id
+
 
 class Drive:
     URL_TEMPLATE = "https://drive.google.com/file/d/{media_id}/view?usp=sharing"
+    FOLDER_URL_TEMPLATE = "https://drive.google.com/drive/folders/{folder_id}"
     FOLDER_MIME = "application/vnd.google-apps.folder"
     SHORTCUT_MIME = "application/vnd.google-apps.shortcut"
     DRIVE_ROOT_ID = os.getenv("DRIVE_ROOT_ID", "root")
+    API_URL = "https://www.googleapis.com/drive/v3"
+    # Drive requires non-final chunks to be a multiple of 256 KiB.
+    CHUNK_ALIGNMENT = 262144
+    CHUNK_SIZE = (
+        max(int(os.getenv("DRIVE_CHUNK_SIZE", 524288)) // CHUNK_ALIGNMENT, 1) * CHUNK_ALIGNMENT
+    )
+    MAX_CHUNK_SIZE = int(os.getenv("DRIVE_MAX_CHUNK_SIZE", 67108864))
+    BUFFER_DEPTH = max(int(os.getenv("DRIVE_BUFFER_DEPTH", 4)), 2)
+    # Max bytes of chunk buffers a single upload holds, chunks never grow past half of it.
+    READ_AHEAD_LIMIT = max(int(os.getenv("DRIVE_READ_AHEAD_LIMIT", 33554432)), 2 * CHUNK_ALIGNMENT)
+    UPLOAD_RETRIES = int(os.getenv("DRIVE_UPLOAD_RETRIES", 5))
+    # Refresh the access token this many seconds before it expires.
+    TOKEN_REFRESH_MARGIN = 300
+    INDEX_SYNC_INTERVAL = int(os.getenv("DRIVE_INDEX_SYNC_INTERVAL", 60))
+    BULK_UPLOAD_WORKERS = max(int(os.getenv("DRIVE_BULK_UPLOAD_WORKERS", 4)), 1)
+    DOWNLOAD_WORKERS = max(int(os.getenv("DRIVE_DOWNLOAD_WORKERS", 4)), 1)
+    # copy | shortcut | off
+    DEDUP_MODE = os.getenv("DRIVE_DEDUP_MODE", "copy")
+    DOWNLOAD_SEGMENT_SIZE = 16777216
 
     def __init__(self):
         self._aiohttp_session = None
         self._progress_store: dict[str, dict[str, str | int | asyncio.Task]] = defaultdict(dict)
         self._creds: Credentials | None = None
-        self.service = None
-        self.files = None
+        self._token_refresh_task: asyncio.Task | None = None
+        self._token_refresher: asyncio.Task | None = None
+        self._index_worker: asyncio.Task | None = None
+        self.index = DriveIndex()
+        # source key -> {"key", "location", "offset", "size"} of unfinished resumable uploads.
+        self._upload_sessions: dict[str, dict[str, str | int]] = {}
         self.is_authenticated = False
 
     async def async_init(self):
@@ -52,22 +372,13 @@ class Drive:
             self._aiohttp_session = aiohttp.ClientSession()
             Config.EXIT_TASKS.append(self._aiohttp_session.close)
         await self.set_creds()
+        session_data = await DB.find_one({"_id": "drive_upload_sessions"}) or {}
+        self._upload_sessions = {
+            session["key"]: session for session in session_data.get("sessions", [])
+        }
 
     @property
     def creds(self):
-        if (
-            isinstance(self._creds, Credentials)
-            and self._creds.expired
-            and self._creds.refresh_token
-        ):
-            self._creds.refresh(Request())
-            asyncio.run_coroutine_threadsafe(
-                coro=DB.add_data(
-                    {"_id": "drive_creds", "creds": json.loads(self._creds.to_json())}
-                ),
-                loop=bot.loop,
-            )
-            bot.log.info("Gdrive Creds Auto-Refreshed")
         return self._creds
 
     @creds.setter
@@ -80,15 +391,176 @@ class Drive:
             self.is_authenticated = False
             return
 
+        old_creds = self.creds
         self.creds = Credentials.from_authorized_user_info(
             info=cred_data["creds"], scopes=["https://www.googleapis.com/auth/drive"]
         )
-        self.service = build(
-            serviceName="drive", version="v3", credentials=self.creds, cache_discovery=False
-        )
-        self.files = self.service.files()
+
+        if old_creds is not None and (old_creds.client_id, old_creds.refresh_token) != (
+            self.creds.client_id,
+            self.creds.refresh_token,
+        ):
+            # Possibly a different account, the index would list files of the old one.
+            self.reset_index()
+
+        if self._token_refresher is None or self._token_refresher.done():
+            self._token_refresher = asyncio.create_task(
+                self.token_refresher(), name="drive_token_refresher"
+            )
+            Config.BACKGROUND_TASKS.append(self._token_refresher)
+
+        if self._index_worker is None or self._index_worker.done():
+            self._index_worker = asyncio.create_task(self.index_worker(), name="drive_index")
+            Config.BACKGROUND_TASKS.append(self._index_worker)
+
         self.is_authenticated = True
 
+    def token_expires_in(self) -> float:
+        """
+        :return: Seconds until the cached access token expires.
+        """
+        if not self._creds.token:
+            return 0
+        if self._creds.expiry is None:
+            return float("inf")
+        # google-auth stores expiry as a naive UTC datetime.
+        return (self._creds.expiry - datetime.now(UTC).replace(tzinfo=None)).total_seconds()
+
+    async def get_token(self) -> str:
+        """
+        :return: The cached bearer token, refreshed first only if it is about to expire.
+        """
+        if self.token_expires_in() <= self.TOKEN_REFRESH_MARGIN:
+            await self.refresh_token()
+        return self._creds.token
+
+    async def refresh_token(self):
+        """Refresh the access token, concurrent callers wait on the same request."""
+        if self._token_refresh_task is None or self._token_refresh_task.done():
+            self._token_refresh_task = asyncio.create_task(
+                self._refresh_token(), name="drive_token_refresh"
+            )
+        await asyncio.shield(self._token_refresh_task)
+
+    async def _refresh_token(self):
+        creds = self._creds
+
+        if not creds.refresh_token:
+            raise Exception("Drive Creds can't be refreshed, run .gsetup again.")
+
+        data = {
+            "grant_type": "refresh_token",
+            "client_id": creds.client_id,
+            "client_secret": creds.client_secret,
+            "refresh_token": creds.refresh_token,
+        }
+        async with self._aiohttp_session.post(url=creds.token_uri, data=data) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                raise Exception(f"Token refresh failed with {resp.status}: {text}")
+            token_info = await resp.json()
+
+        creds.token = token_info["access_token"]
+        creds.expiry = datetime.now(UTC).replace(tzinfo=None) + timedelta(
+            seconds=token_info.get("expires_in", 3600)
+        )
+        await DB.add_data({"_id": "drive_creds", "creds": json.loads(creds.to_json())})
+        bot.log.info("Gdrive Creds Auto-Refreshed")
+
+    async def token_refresher(self):
+        """Refresh the token in the background shortly before it expires."""
+        while self._creds is not None:
+            wait = self.token_expires_in() - self.TOKEN_REFRESH_MARGIN
+            if wait > 0:
+                await asyncio.sleep(min(wait, 3600))
+                continue
+            try:
+                await self.refresh_token()
+            except Exception as e:
+                bot.log.error(f"Gdrive Creds refresh failed: {e}")
+                await asyncio.sleep(60)
+
+    async def build_index(self):
+        """Load the metadata of every file in Drive into the index."""
+        self.index.clear()
+
+        start_token = await self.api_request("GET", "changes/startPageToken")
+        root = await self.get_file("root", fields="id")
+
+        params = {
+            "q": "trashed=false",
+            "pageSize": 1000,
+            "fields": f"nextPageToken, files({DriveIndex.FIELDS})",
+        }
+        while True:
+            result = await self.api_request("GET", "files", params=params)
+            for file in result.get("files", []):
+                self.index.add(file)
+
+            if not (next_token := result.get("nextPageToken")):
+                break
+            params["pageToken"] = next_token
+
+        self.index.root_id = root["id"]
+        self.index.page_token = start_token["startPageToken"]
+        self.index.is_ready = True
+        bot.log.info(f"Gdrive Index built with {len(self.index.files)} files.")
+
+    async def sync_index(self):
+        """Apply changes made since the last sync to the index."""
+        params = {
+            "pageToken": self.index.page_token,
+            "pageSize": 1000,
+            "fields": (
+                "nextPageToken, newStartPageToken, "
+                f"changes(fileId, removed, file({DriveIndex.FIELDS}))"
+            ),
+        }
+        while True:
+            result = await self.api_request("GET", "changes", params=params)
+
+            for change in result.get("changes", []):
+                if change.get("removed") or "file" not in change:
+                    self.index.remove(change["fileId"])
+                else:
+                    self.index.add(change["file"])
+
+            if new_start_token := result.get("newStartPageToken"):
+                self.index.page_token = new_start_token
+                break
+
+            params["pageToken"] = result["nextPageToken"]
+
+    def reset_index(self):
+        """Stop the index worker and drop the index, set_creds starts a fresh one."""
+        if self._index_worker is not None and not self._index_worker.done():
+            self._index_worker.cancel()
+        self._index_worker = None
+        self.index.clear()
+
+    async def index_worker(self):
+        while self._creds is not None:
+            try:
+                if self.index.is_ready:
+                    await self.sync_index()
+                else:
+                    await self.build_index()
+            except Exception as e:
+                bot.log.error(f"Gdrive Index sync failed: {e}")
+
+            await asyncio.sleep(self.INDEX_SYNC_INTERVAL)
+
+        self.index.clear()
+
+    @property
+    def root_id(self) -> str | None:
+        """
+        :return: DRIVE_ROOT_ID with the 'root' alias resolved once the index is ready.
+        """
+        if self.DRIVE_ROOT_ID == "root":
+            return self.index.root_id
+        return self.DRIVE_ROOT_ID
+
     def ensure_creds(self, func):
         @wraps(func)
         async def inner(bot: BOT, message: Message):
@@ -115,7 +587,39 @@ class Drive:
         :param search_param: A string to search for in file/folder names.
         :return: A list of dictionaries containing file/folder id, name and mimeType.
         """
-        return await asyncio.to_thread(self._list, _id, limit, file_only, folder_only, search_param)
+        return await self._list(_id, limit, file_only, folder_only, search_param)
+
+    async def api_request(
+        self, method: str, endpoint: str, params: dict | None = None, json_data: dict | None = None
+    ) -> dict:
+        """
+        Call the Drive v3 REST API on the shared aiohttp session.
+
+        :param method: HTTP method.
+        :param endpoint: Path after /drive/v3/, e.g. files or files/{id}.
+        :param params: Query parameters.
+        :param json_data: JSON body.
+        :return: The decoded JSON response.
+        """
+        headers = {"Authorization": f"Bearer {await self.get_token()}"}
+        async with self._aiohttp_session.request(
+            method=method,
+            url=f"{self.API_URL}/{endpoint}",
+            params=params,
+            json=json_data,
+            headers=headers,
+        ) as resp:
+            if resp.status >= 400:
+                text = await resp.text()
+                raise DriveHTTPError(
+                    resp.status, f"Drive API {endpoint} failed with {resp.status}: {text}"
+                )
+            return await resp.json()
+
+    async def get_file(self, file_id: str, fields: str = "id, name, mimeType") -> dict:
+        return await self.api_request(
+            "GET", f"files/{file_id}", params={"fields": fields, "supportsAllDrives": "true"}
+        )
 
     async def upload_from_url(
         self,
@@ -153,7 +657,7 @@ class Drive:
             if isinstance(task, asyncio.Task):
                 task.cancel()
 
-    def _list(
+    async def _list(
         self,
         _id: bool = False,
         limit: int = 10,
@@ -162,6 +666,31 @@ class Drive:
         search_param: str | None = None,
     ) -> list[dict[str, str | int]]:
 
+        if self.index.is_ready:
+            if search_param is None:
+                parent_id, name = self.root_id, None
+            elif _id:
+                if "/" in search_param:
+                    search_param = self.index.resolve_path(search_param, self.root_id)
+                    if search_param is None:
+                        return []
+                parent_id, name = search_param, None
+            else:
+                parent_id, name = None, search_param
+
+            files = self.index.query(
+                parent_id=parent_id,
+                name=name,
+                file_only=file_only,
+                folder_only=folder_only,
+                limit=limit,
+            )
+            if files:
+                return files
+
+            if search_param is None:
+                return []
+
         query_params = ["trashed=false"]
 
         if folder_only:
@@ -181,18 +710,21 @@ class Drive:
 
         files = []
 
-        fields = "nextPageToken, files(id, name, mimeType, shortcutDetails)"
-        result = self.files.list(q=query, pageSize=limit, fields=fields).execute()
+        params = {
+            "q": query,
+            "pageSize": limit,
+            "fields": "nextPageToken, files(id, name, mimeType, shortcutDetails)",
+        }
+        result = await self.api_request("GET", "files", params=params)
         files.extend(result.get("files", []))
 
         while next_token := result.get("nextPageToken"):
             if len(files) >= limit:
                 break
             else:
-                file_limit = limit - len(files)
-            result = self.files.list(
-                q=query, pageSize=file_limit, fields=fields, pageToken=next_token
-            ).execute()
+                params["pageSize"] = limit - len(files)
+            params["pageToken"] = next_token
+            result = await self.api_request("GET", "files", params=params)
             files.extend(result.get("files", []))
 
         return files[0:limit]
@@ -202,7 +734,7 @@ class Drive:
         :return: An url pointing to a location in drive.
         """
         headers = {
-            "Authorization": f"Bearer {self.creds.token}",
+            "Authorization": f"Bearer {await self.get_token()}",
             "Content-Type": "application/json",
             "X-Upload-Content-Type": "application/octet-stream",
         }
@@ -227,7 +759,74 @@ class Drive:
                 return file["id"]
             else:
                 text = await put.text()
-                raise Exception(f"Chunk upload failed with {put.status}: {text}")
+                raise DriveHTTPError(put.status, f"Chunk upload failed with {put.status}: {text}")
+
+    async def get_upload_status(self, location: str, total_size: int) -> int | str:
+        """
+        Ask Drive how much of a resumable upload it has stored.
+
+        :return: The committed byte offset, or the file id if the upload already finished.
+        """
+        headers = {
+            "Content-Range": f"bytes */{total_size}",
+            "Authorization": f"Bearer {await self.get_token()}",
+        }
+        async with self._aiohttp_session.put(location, headers=headers) as put:
+            if put.status == 308:
+                # Range: bytes=0-<last committed byte>, absent if nothing is stored yet.
+                committed = put.headers.get("Range")
+                return int(committed.rsplit("-", 1)[1]) + 1 if committed else 0
+            elif put.status in (200, 201):
+                file = await put.json()
+                return file["id"]
+            else:
+                text = await put.text()
+                raise DriveHTTPError(put.status, f"Status check failed with {put.status}: {text}")
+
+    async def save_upload_sessions(self):
+        await DB.add_data(
+            {"_id": "drive_upload_sessions", "sessions": list(self._upload_sessions.values())}
+        )
+
+    async def get_upload_session(
+        self, key: str, file_name: str, folder_id: str | None, total_size: int
+    ) -> dict[str, str | int]:
+        """
+        Re-use an unfinished resumable session for the same source or create a new one.
+
+        :param key: Identifier of the upload source.
+        :return: Session dict with its location and the byte offset to continue from,
+            and the file id if Drive already finished it.
+        """
+        session = self._upload_sessions.get(key)
+
+        if session and session["size"] == total_size:
+            try:
+                status = await self.get_upload_status(session["location"], total_size)
+                if isinstance(status, str):
+                    # Last chunk landed but the upload was interrupted before it was recorded.
+                    session["offset"] = total_size
+                    session["file_id"] = status
+                else:
+                    session["offset"] = status
+                return session
+            except (DriveHTTPError, aiohttp.ClientError, asyncio.TimeoutError):
+                # Expired or unreachable session, start over.
+                pass
+
+        session = {
+            "key": key,
+            "location": await self.create_file(file_name, folder_id),
+            "offset": 0,
+            "size": total_size,
+        }
+        self._upload_sessions[key] = session
+        await self.save_upload_sessions()
+        return session
+
+    async def drop_upload_session(self, key: str):
+        if self._upload_sessions.pop(key, None):
+            await self.save_upload_sessions()
 
     async def _upload_from_url(
         self,
@@ -247,69 +846,567 @@ class Drive:
 
             file_session = downloader.file_response_session
             file_session.raise_for_status()
-            drive_location = await self.create_file(downloader.file_name, folder_id)
-            start = 0
-            buffer = b""
-            chunk_size = 524288
-
-            async for chunk in downloader.iter_chunks(chunk_size):
-                buffer += chunk
-                if len(buffer) < chunk_size:
-                    continue
-                else:
-                    chunk = buffer[:chunk_size]
-                    end = start + len(chunk) - 1
-                    put_headers = {
-                        "Content-Range": f"bytes {start}-{end}/{downloader.size_bytes}",
-                        "Authorization": f"Bearer {self.creds.token}",
-                    }
-                    file_id = await self.upload_chunk(drive_location, put_headers, chunk)
-                    start += len(chunk)
-                    store["uploaded_size"] += len(chunk)
-                    buffer = buffer[chunk_size:]
-
-            if buffer:
-                end = start + len(buffer) - 1
-                put_headers = {
-                    "Content-Range": f"bytes {start}-{end}/{downloader.size_bytes}",
-                    "Authorization": f"Bearer {self.creds.token}",
-                }
-                file_id = await self.upload_chunk(drive_location, put_headers, buffer)
-                start = end + 1
-                store["uploaded_size"] = start
-                buffer = b""
+
+            dedup_keys = [f"url:{file_url}"]
+            file_id = await self.find_duplicate(
+                dedup_keys, downloader.file_name, folder_id, downloader.size_bytes
+            )
+            if file_id:
+                return file_id
+
+            session_key = f"{file_url}|{folder_id}"
+            session = await self.get_upload_session(
+                session_key, downloader.file_name, folder_id, downloader.size_bytes
+            )
+            store["uploaded_size"] += session["offset"]
+
+            file_id = await self.pipe_to_drive(
+                source=skip_bytes(downloader.iter_chunks(self.CHUNK_SIZE), session["offset"]),
+                session=session,
+                store=store,
+            )
+            await self.drop_upload_session(session_key)
+            await self.record_upload(file_id, dedup_keys)
 
         store["done"] = True
         return file_id
 
+    async def find_duplicate(
+        self, keys: list[str], file_name: str, folder_id: str | None, file_size: int
+    ) -> str | None:
+        """
+        Look for an already uploaded file with the same content.
+
+        :param keys: Source keys of the file, see DEDUP_DB.
+        :return: ID of a server-side copy/shortcut of it in folder_id, or None to upload.
+        """
+        if self.DEDUP_MODE == "off":
+            return
+
+        for key in keys:
+            if not (entry := await DEDUP_DB.find_one({"_id": key})):
+                continue
+
+            if file_size and entry.get("size") and int(entry["size"]) != file_size:
+                continue
+
+            try:
+                existing = await self.get_file(
+                    entry["file_id"], fields="id, name, parents, trashed"
+                )
+            except DriveHTTPError as e:
+                if e.status != 404:
+                    # Can't tell if the copy still exists, upload without dropping the entry.
+                    continue
+                existing = {"trashed": True}
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                continue
+
+            if existing.get("trashed"):
+                await DEDUP_DB.delete_data(id=key)
+                continue
+
+            parent_id = folder_id or self.DRIVE_ROOT_ID
+            parents = existing.get("parents", [])
+            if existing["name"] == file_name and (
+                parent_id in parents or (parent_id == "root" and self.root_id in parents)
+            ):
+                return existing["id"]
+
+            return await self.clone(existing["id"], file_name, parent_id)
+
+    async def clone(self, file_id: str, file_name: str, folder_id: str) -> str:
+        """
+        :return: ID of a copy of (or shortcut to) file_id, as set by DEDUP_MODE.
+        """
+        if self.DEDUP_MODE == "shortcut":
+            file = await self.api_request(
+                "POST",
+                "files",
+                params={"fields": DriveIndex.FIELDS},
+                json_data={
+                    "name": file_name,
+                    "mimeType": self.SHORTCUT_MIME,
+                    "parents": [folder_id],
+                    "shortcutDetails": {"targetId": file_id},
+                },
+            )
+        else:
+            file = await self.api_request(
+                "POST",
+                f"files/{file_id}/copy",
+                params={"fields": DriveIndex.FIELDS, "supportsAllDrives": "true"},
+                json_data={"name": file_name, "parents": [folder_id]},
+            )
+        self.index.add(file)
+        return file["id"]
+
+    async def record_upload(self, file_id: str | None, keys: list[str]):
+        """Add an uploaded file to the index and remember it under its source keys and its md5."""
+        if file_id is None:
+            return
+
+        try:
+            file = await self.get_file(file_id, fields=f"{DriveIndex.FIELDS}, md5Checksum")
+        except (DriveHTTPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # The upload itself went through, the next index sync picks the file up.
+            bot.log.error(f"Gdrive couldn't fetch uploaded file {file_id}: {e}")
+            return
+
+        self.index.add(file)
+
+        if self.DEDUP_MODE == "off":
+            return
+
+        entry = {"file_id": file_id, "size": file.get("size")}
+
+        if md5 := file.get("md5Checksum"):
+            keys = {*keys, f"md5:{md5}"}
+
+        await asyncio.gather(*(DEDUP_DB.add_data({"_id": key, **entry}) for key in keys))
+
+    def get_chunk_sizer(self) -> ChunkSizer:
+        return ChunkSizer(
+            initial=self.CHUNK_SIZE,
+            ceiling=min(self.MAX_CHUNK_SIZE, self.READ_AHEAD_LIMIT // 2),
+            alignment=self.CHUNK_ALIGNMENT,
+        )
+
+    @staticmethod
+    async def rechunk(
+        source: AsyncIterator[bytes], sizer: ChunkSizer, pool: BufferPool
+    ) -> AsyncIterator[ChunkBuffer]:
+        """
+        Re-slice an async byte stream into chunks sized by the sizer.
+
+        Every chunk except the last one is full, which keeps them aligned
+        no matter what size the source yields.
+        A yielded buffer is only re-used after the consumer puts it back in the pool.
+        """
+        buffer = await pool.get(sizer.size)
+
+        async for data in source:
+            data = memoryview(data)
+            while data:
+                data = buffer.fill(data)
+
+                if buffer.is_full:
+                    yield buffer
+                    buffer = await pool.get(sizer.size)
+
+        if buffer.filled:
+            yield buffer
+
+    async def put_buffer(self, session: dict, buffer: ChunkBuffer, sizer: ChunkSizer) -> str | None:
+        """
+        PUT a chunk at the session's committed offset.
+
+        On a 5xx, 429 or a dropped connection the session status is queried
+        and only the bytes Drive hasn't stored yet are re-sent, with exponential backoff.
+        """
+        start = session["offset"]
+        chunk = buffer.chunk
+        put_start = time.perf_counter()
+
+        for attempt in range(self.UPLOAD_RETRIES + 1):
+            offset, total_size = session["offset"], session["size"]
+            headers = {
+                "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{total_size}",
+                "Authorization": f"Bearer {await self.get_token()}",
+            }
+            try:
+                file_id = await self.upload_chunk(session["location"], headers, chunk)
+                break
+            except (DriveHTTPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if (
+                    isinstance(e, DriveHTTPError) and e.status != 429 and e.status < 500
+                ) or attempt == self.UPLOAD_RETRIES:
+                    await self.save_upload_sessions()
+                    raise
+
+                await asyncio.sleep(min(2**attempt, 32))
+                try:
+                    status = await self.get_upload_status(session["location"], total_size)
+                except (DriveHTTPError, aiohttp.ClientError, asyncio.TimeoutError):
+                    # Status unknown, re-send from the last known offset.
+                    continue
+
+                if isinstance(status, str):
+                    return status
+
+                if status < start:
+                    raise DriveHTTPError(0, f"Drive lost already committed bytes from {status}.")
+
+                if status >= start + buffer.filled:
+                    # Stored before the reply was lost, nothing left to re-send.
+                    file_id = None
+                    break
+
+                session["offset"] = status
+                chunk = buffer.chunk[status - start :]
+
+        session["offset"] = start + buffer.filled
+
+        if buffer.is_full:
+            sizer.record(buffer.filled, time.perf_counter() - put_start)
+
+        return file_id
+
+    async def pipe_to_drive(
+        self, source: AsyncIterator[bytes], session: dict, store: dict
+    ) -> str | None:
+        """
+        Upload an async byte stream to a resumable session while it is still being read.
+
+        The source is re-chunked into a small ring of pre-allocated, 256 KiB aligned buffers,
+        so up to BUFFER_DEPTH chunks are read ahead while the previous one is being PUT,
+        within READ_AHEAD_LIMIT bytes.
+
+        :param source: Async iterator yielding the file's bytes from the session's offset.
+        :param session: Resumable session from get_upload_session.
+        :param store: Progress store to update.
+        :return: Drive file id once the last chunk is accepted.
+        """
+        if session.get("file_id"):
+            return session["file_id"]
+
+        sizer = self.get_chunk_sizer()
+        pool = BufferPool(
+            count=self.BUFFER_DEPTH,
+            size=sizer.size,
+            limit=self.READ_AHEAD_LIMIT,
+            alignment=self.CHUNK_ALIGNMENT,
+        )
+        filled_buffers: asyncio.Queue[ChunkBuffer | None] = asyncio.Queue()
+
+        async def reader():
+            try:
+                async for buffer in self.rechunk(source, sizer, pool):
+                    await filled_buffers.put(buffer)
+            finally:
+                filled_buffers.put_nowait(None)
+
+        reader_task = asyncio.create_task(reader(), name="drive_chunk_reader")
+
+        file_id = None
+
+        try:
+            while (buffer := await filled_buffers.get()) is not None:
+                offset = session["offset"]
+                file_id = await self.put_buffer(session, buffer, sizer)
+                # Incremented, so a store can be shared by concurrent uploads.
+                store["uploaded_size"] += session["offset"] - offset
+                pool.put(buffer)
+
+            # Surface errors raised while reading the source.
+            await reader_task
+        finally:
+            if not reader_task.done():
+                reader_task.cancel()
+
+        return file_id
+
     async def _upload_from_telegram(
         self, media_message: Message, message_to_edit: Message = None, folder_id: str = None
     ):
         media = get_tg_media_details(media_message)
+        file_size = getattr(media, "file_size", 0)
 
         store = self._progress_store[message_to_edit.task_id]
-        store["size"] = getattr(media, "file_size", 0)
+        store["size"] = file_size
         store["done"] = False
         store["uploaded_size"] = 0
         store["edit_task"] = asyncio.create_task(
             self.progress_worker(store, message_to_edit), name="tg_drive_up_prog"
         )
 
-        start = 0
-        drive_location = await self.create_file(getattr(media, "file_name"), folder_id)
-        file_id = None
+        unique_id = getattr(media, "file_unique_id", message_to_edit.task_id)
+        dedup_keys = [f"tg:{unique_id}"]
+        file_id = await self.find_duplicate(
+            dedup_keys, getattr(media, "file_name"), folder_id, file_size
+        )
+        if file_id:
+            return file_id
+
+        session_key = f"{unique_id}|{folder_id}"
+        session = await self.get_upload_session(
+            session_key, getattr(media, "file_name"), folder_id, file_size
+        )
+        store["uploaded_size"] += session["offset"]
+
+        # stream_media can only seek in whole chunks, skip the rest by hand.
+        tg_chunks, extra_bytes = divmod(session["offset"], TG_STREAM_CHUNK_SIZE)
         # noinspection PyTypeChecker
-        async for chunk in message_to_edit._client.stream_media(message=media_message):
-            end = start + len(chunk) - 1
+        stream = message_to_edit._client.stream_media(message=media_message, offset=tg_chunks)
+
+        # Keeps the MTProto download running while the previous chunk is being PUT.
+        file_id = await self.pipe_to_drive(
+            source=skip_bytes(stream, extra_bytes), session=session, store=store
+        )
+        await self.drop_upload_session(session_key)
+        await self.record_upload(file_id, dedup_keys)
+        return file_id
+
+    async def upload_from_path(self, file_path: str, store: dict, folder_id: str = None):
+        """
+        Upload a local file, adding its progress to store["uploaded_size"].
+
+        :return: Drive file id.
+        """
+        file_size = os.path.getsize(file_path)
+        file_name = os.path.basename(file_path)
+
+        dedup_keys = []
+        if self.DEDUP_MODE != "off":
+            dedup_keys.append(f"md5:{await asyncio.to_thread(md5_file, file_path)}")
+            file_id = await self.find_duplicate(dedup_keys, file_name, folder_id, file_size)
+            if file_id:
+                store["uploaded_size"] += file_size
+                return file_id
+
+        session_key = f"{os.path.abspath(file_path)}|{folder_id}"
+        session = await self.get_upload_session(session_key, file_name, folder_id, file_size)
+
+        if not file_size:
+            # Nothing to PUT, just finalise the empty upload.
+            file_id = await self.get_upload_status(session["location"], 0)
+        else:
+            store["uploaded_size"] += session["offset"]
+            file_id = await self.pipe_to_drive(
+                source=read_file(file_path, session["offset"]), session=session, store=store
+            )
+
+        await self.drop_upload_session(session_key)
+        await self.record_upload(file_id, dedup_keys)
+        return file_id
+
+    async def create_folder(self, name: str, parent_id: str = None) -> str:
+        """
+        :return: ID of an existing folder with the same name in parent or a new one.
+        """
+        parent_id = parent_id or self.DRIVE_ROOT_ID
+
+        if self.index.is_ready:
+            lookup_id = self.root_id if parent_id == "root" else parent_id
+            if (folder_id := self.index.resolve_path(name, lookup_id)) is not None:
+                return folder_id
+
+        folder = await self.api_request(
+            "POST",
+            "files",
+            params={"fields": DriveIndex.FIELDS},
+            json_data={"name": name, "mimeType": self.FOLDER_MIME, "parents": [parent_id]},
+        )
+        self.index.add(folder)
+        return folder["id"]
+
+    async def upload_bulk(
+        self, files: list[str], base_dir: str, message_to_edit: Message, folder_id: str = None
+    ) -> str:
+        try:
+            return await self._upload_bulk(files, base_dir, message_to_edit, folder_id)
+        except Exception as e:
+            return f"Error:\n{e}"
+        finally:
+            store = self._progress_store.pop(message_to_edit.task_id, {})
+            store["done"] = True
+            task = store.get("edit_task")
+            if isinstance(task, asyncio.Task):
+                task.cancel()
+
+    async def _upload_bulk(
+        self, files: list[str], base_dir: str, message_to_edit: Message, folder_id: str = None
+    ) -> str:
+        """
+        Mirror local files into Drive, keeping their folder structure relative to base_dir.
+
+        Folders are created once up front, files are then uploaded by
+        BULK_UPLOAD_WORKERS concurrent resumable sessions sharing one progress store.
+        """
+        root_id = folder_id or self.DRIVE_ROOT_ID
+        folder_ids: dict[str, str] = {"": root_id}
+
+        for rel_dir in sorted({os.path.dirname(os.path.relpath(f, base_dir)) for f in files}):
+            parent = ""
+            for part in rel_dir.split(os.sep) if rel_dir else []:
+                path = os.path.join(parent, part)
+                if path not in folder_ids:
+                    folder_ids[path] = await self.create_folder(part, folder_ids[parent])
+                parent = path
+
+        total = len(files)
+        store = self._progress_store[message_to_edit.task_id]
+        store["size"] = sum(os.path.getsize(f) for f in files)
+        store["done"] = False
+        store["uploaded_size"] = 0
+        store["action_str"] = f"Uploading to Drive: 0/{total} files..."
+        store["edit_task"] = asyncio.create_task(
+            self.progress_worker(store, message_to_edit), name="bulk_drive_up_prog"
+        )
+
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        for file in files:
+            queue.put_nowait(file)
+
+        uploaded = 0
+        failed: list[str] = []
+
+        async def worker():
+            nonlocal uploaded
+            while not queue.empty():
+                file = queue.get_nowait()
+                parent_id = folder_ids[os.path.dirname(os.path.relpath(file, base_dir))]
+                try:
+                    await self.upload_from_path(file, store, parent_id)
+                    uploaded += 1
+                except Exception as e:
+                    bot.log.error(f"Gdrive bulk upload failed for {file}: {e}")
+                    failed.append(os.path.relpath(file, base_dir))
+                store["action_str"] = f"Uploading to Drive: {uploaded}/{total} files..."
+
+        await asyncio.gather(*(worker() for _ in range(min(self.BULK_UPLOAD_WORKERS, total))))
+
+        resp_str = (
+            f"Uploaded <b>{uploaded}/{total}</b> files to "
+            f"<a href='{self.FOLDER_URL_TEMPLATE.format(folder_id=root_id)}'>Drive</a>."
+        )
+        if failed:
+            resp_str += "\n\n<b>Failed</b>:\n• " + "\n• ".join(failed)
+        return resp_str
+
+    async def download(
+        self, file_id: str, dir_name: Path, message_to_edit: Message = None
+    ) -> DownloadedFile:
+        """
+        Download a file with DOWNLOAD_WORKERS concurrent Range requests.
+
+        Segments are written straight to their offset in a pre-allocated sparse file,
+        the result is then checked against Drive's md5Checksum.
+        """
+        file = await self.get_file(file_id, fields="id, name, mimeType, size, md5Checksum")
+
+        if "size" not in file:
+            raise Exception(
+                f"{file['name']} is a Google {file['mimeType']} and can't be downloaded."
+            )
+
+        file_size = int(file["size"])
+        dir_name.mkdir(parents=True, exist_ok=True)
+        path = str(dir_name / safe_file_name(file["name"], file["id"]))
+
+        store = self._progress_store[message_to_edit.task_id]
+        store["size"] = file_size
+        store["done"] = False
+        store["uploaded_size"] = 0
+        store["action_str"] = "Downloading from Drive..."
+        store["edit_task"] = asyncio.create_task(
+            self.progress_worker(store, message_to_edit), name="drive_dl_prog"
+        )
+
+        segments: asyncio.Queue[tuple[int, int]] = asyncio.Queue()
+        for start in range(0, file_size, self.DOWNLOAD_SEGMENT_SIZE):
+            segments.put_nowait((start, min(start + self.DOWNLOAD_SEGMENT_SIZE, file_size) - 1))
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+        try:
+            os.truncate(fd, file_size)
+
+            async def worker():
+                while not segments.empty():
+                    start, end = segments.get_nowait()
+                    await self.download_segment(file_id, fd, start, end, store)
+
+            workers = min(self.DOWNLOAD_WORKERS, segments.qsize())
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            os.close(fd)
+            store = self._progress_store.pop(message_to_edit.task_id, {})
+            store["done"] = True
+            task = store.get("edit_task")
+            if isinstance(task, asyncio.Task):
+                task.cancel()
+
+        if (
+            file.get("md5Checksum")
+            and await asyncio.to_thread(md5_file, path) != file["md5Checksum"]
+        ):
+            raise Exception(f"md5 mismatch for {file['name']}, download is corrupt.")
+
+        return DownloadedFile(file=path)
+
+    async def download_segment(self, file_id: str, fd: int, start: int, end: int, store: dict):
+        """Fetch bytes start-end into fd, resuming from the last written byte on errors."""
+        offset = start
+
+        for attempt in range(self.UPLOAD_RETRIES + 1):
+            if offset > end:
+                # Everything arrived before the error, a retry would ask for an empty range.
+                return
             headers = {
-                "Content-Range": f"bytes {start}-{end}/{getattr(media, "file_size", 0)}",
-                "Authorization": f"Bearer {self.creds.token}",
+                "Authorization": f"Bearer {await self.get_token()}",
+                "Range": f"bytes={offset}-{end}",
             }
-            file_id = await self.upload_chunk(drive_location, headers, chunk)
-            start = end + 1
-            store["uploaded_size"] = end + 1
+            try:
+                async with self._aiohttp_session.get(
+                    url=f"{self.API_URL}/files/{file_id}",
+                    params={"alt": "media", "supportsAllDrives": "true"},
+                    headers=headers,
+                    timeout=STREAM_TIMEOUT,
+                ) as resp:
+                    if resp.status != 206:
+                        text = await resp.text()
+                        raise DriveHTTPError(
+                            resp.status, f"Download failed with {resp.status}: {text}"
+                        )
+                    async for data in resp.content.iter_chunked(TG_STREAM_CHUNK_SIZE):
+                        await asyncio.to_thread(os.pwrite, fd, data, offset)
+                        offset += len(data)
+                        store["uploaded_size"] += len(data)
+                return
+            except (DriveHTTPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if (
+                    isinstance(e, DriveHTTPError) and e.status != 429 and e.status < 500
+                ) or attempt == self.UPLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(min(2**attempt, 32))
+
+    async def iter_file(self, file_id: str, size: int) -> AsyncIterator[bytes]:
+        """Yield a file's bytes in order, resuming with a Range request after errors."""
+        if not size:
+            return
 
-        return file_id
+        offset = 0
+
+        for attempt in range(self.UPLOAD_RETRIES + 1):
+            if offset >= size:
+                # Everything arrived before the error, a retry would ask for an empty range.
+                return
+            headers = {
+                "Authorization": f"Bearer {await self.get_token()}",
+                "Range": f"bytes={offset}-{size - 1}",
+            }
+            try:
+                async with self._aiohttp_session.get(
+                    url=f"{self.API_URL}/files/{file_id}",
+                    params={"alt": "media", "supportsAllDrives": "true"},
+                    headers=headers,
+                    timeout=STREAM_TIMEOUT,
+                ) as resp:
+                    if resp.status not in {200, 206}:
+                        text = await resp.text()
+                        raise DriveHTTPError(
+                            resp.status, f"Download failed with {resp.status}: {text}"
+                        )
+                    async for data in resp.content.iter_chunked(TG_STREAM_CHUNK_SIZE):
+                        offset += len(data)
+                        yield data
+                return
+            except (DriveHTTPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if (
+                    isinstance(e, DriveHTTPError) and e.status != 429 and e.status < 500
+                ) or attempt == self.UPLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(min(2**attempt, 32))
 
     @staticmethod
     async def progress_worker(store: dict, message: Message):
@@ -321,7 +1418,7 @@ class Drive:
                 current_size=store["uploaded_size"],
                 total_size=store["size"] or 1,
                 response=message,
-                action_str="Uploading to Drive...",
+                action_str=store.get("action_str", "Uploading to Drive..."),
             )
             await asyncio.sleep(5)
 
@@ -396,11 +1493,10 @@ async def set_drive_creds(bot: BOT, message: Message):
         creds_json = json.loads(creds)
         creds = Credentials.from_authorized_user_info(info=creds_json)
 
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-
         await DB.add_data({"_id": "drive_creds", "creds": json.loads(creds.to_json())})
         await drive.set_creds()
+        # Validates the creds and refreshes them if expired.
+        await drive.get_token()
         await message.reply("Creds added!")
     except Exception as e:
         await message.reply(e)
@@ -418,6 +1514,8 @@ async def remove_drive_creds(bot: BOT, message: Message):
         return
 
     drive.is_authenticated = False
+    drive.creds = None
+    drive.reset_index()
     await DB.delete_data({"_id": "drive_creds"})
     await response.edit("Creds Deleted Successfully!")
 
@@ -437,7 +1535,7 @@ async def list_drive(bot: BOT, message: Message):
     USAGE:
         .gls [-f|-d]
         .gls [-f|-d] abc (lists files/folders matching abc in name)
-        .gls -id <folder id>
+        .gls -id <folder id | folder/path>
         .gls [-f|-d] -l 20 (lists 20 results)
         .gls -l 20 abc (tries to list 20 results containing abc in name)
     """
@@ -511,14 +1609,44 @@ async def upload_to_drive(bot: BOT, message: Message):
     FLAGS:
         -id: folder id
         -e: if the url is encoded
+        -bulk: upload a local folder or glob, keeping the folder structure
     USAGE:
         .gup [reply to a message | url]
         .gup -id <folder id> [reply to a message | url]
+        .gup -bulk downloads/videos
+        .gup -bulk -id <folder id> downloads/videos/*.mp4
     """
     reply = message.replied
     response = await message.reply("Checking Input...")
 
-    if reply and reply.media:
+    if "-bulk" in message.flags:
+        if "-id" in message.flags:
+            folder_id, path = message.filtered_input.split(maxsplit=1)
+        else:
+            folder_id, path = None, message.filtered_input
+
+        if os.path.isdir(path):
+            path = os.path.abspath(path)
+            files = glob.glob(os.path.join(glob.escape(path), "**", "*"), recursive=True)
+            # Parent of the dir, so the dir itself is re-created in Drive.
+            base_dir = os.path.dirname(path)
+        else:
+            files = [os.path.abspath(f) for f in glob.glob(path, recursive=True)]
+            base_dir = None
+
+        files = [f for f in files if os.path.isfile(f)]
+
+        if not files:
+            await response.edit("Invalid Folder path/regex or Folder Empty")
+            return
+
+        if base_dir is None:
+            base_dir = os.path.commonpath([os.path.dirname(f) for f in files])
+
+        await response.edit(f"Preparing to upload {len(files)} files.")
+        upload_coro = drive.upload_bulk(files, base_dir, response, folder_id=folder_id)
+
+    elif reply and reply.media:
         folder_id = message.filtered_input if "-id" in message.flags else None
         upload_coro = drive.upload_from_telegram(reply, response, folder_id=folder_id)
 
@@ -541,3 +1669,70 @@ async def upload_to_drive(bot: BOT, message: Message):
         return
 
     await response.edit(await upload_coro)
+
+
+@BOT.add_cmd(cmd="gdl")
+@drive.ensure_creds
+async def download_from_drive(bot: BOT, message: Message):
+    """
+    CMD: GDL
+    INFO: Download a file from Drive
+    FLAGS:
+        -tg: stream the file to telegram instead of saving it
+    USAGE:
+        .gdl <file id | link>
+        .gdl -tg <file id | link>
+    """
+    response = await message.reply("Checking Input...")
+
+    file_id = extract_file_id(message.filtered_input)
+
+    if not file_id:
+        await response.edit("Give a Drive file id or link.")
+        return
+
+    dl_path = Path("downloads") / str(time.time())
+
+    try:
+        if "-tg" in message.flags:
+            await stream_drive_file_to_tg(file_id=file_id, message=message, response=response)
+            return
+
+        downloaded_file = await drive.download(file_id, dl_path, message_to_edit=response)
+        await response.edit(
+            f"<code>{downloaded_file.path}</code>"
+            f"\n\n<code>{downloaded_file.size}</code> mb"
+            "\n\n<b>Downloaded.</b>"
+        )
+
+    except asyncio.exceptions.CancelledError:
+        await response.edit("Cancelled....")
+
+    except asyncio.TimeoutError:
+        await response.edit("Download timed out, Drive stopped sending data.")
+
+    except Exception as e:
+        await response.edit(str(e))
+
+
+async def stream_drive_file_to_tg(file_id: str, message: Message, response: Message):
+    file = await drive.get_file(file_id, fields="id, name, mimeType, size")
+
+    if "size" not in file:
+        await response.edit(f"{file['name']} is a Google {file['mimeType']} and can't be sent.")
+        return
+
+    size = int(file["size"])
+    if size_over_limit(size / 1048576, client=message._client):
+        await response.edit("<b>Aborted</b>, File size exceeds TG Limits!!!")
+        return
+
+    await stream_to_tg(
+        source=drive.iter_file(file_id, size),
+        size=size,
+        file_name=file["name"],
+        mime_type=file["mimeType"],
+        message=message,
+        response=response,
+    )
+    await response.delete()
@@ -1,42 +1,138 @@
 import asyncio
 import glob
+import hashlib
+import json
+import math
 import os
 import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
 from functools import partial
 from typing import Union
+from urllib.parse import unquote, urlparse
 
-from pyrogram.types import ReplyParameters
-from ub_core.utils import (
-    Download,
-    DownloadedFile,
-    MediaType,
-    check_audio,
-    get_duration,
-    progress,
-    take_ss,
-)
+import aiohttp
+from pyrogram import raw
+from pyrogram.errors import BadRequest, FloodWait
+from pyrogram.types import InputMediaPhoto, InputMediaVideo, ReplyParameters
+from ub_core.utils import Download, DownloadedFile, MediaType, progress
 
-from app import BOT, Config, Message
+from app import BOT, Config, CustomDB, Message, extra_config
 
 UPLOAD_TYPES = Union[BOT.send_audio, BOT.send_document, BOT.send_photo, BOT.send_video]
 
 
+class MediaInfo:
+    def __init__(self, duration: int, has_audio: bool, width: int, height: int):
+        self.duration = duration
+        self.has_audio = has_audio
+        self.width = width
+        self.height = height
+        # Mid-point frames are less likely to be a black intro or credits.
+        self.thumb_timestamp: float = duration / 2
+        self.thumb: str | None = None
+
+
+# (path, mtime, size) -> MediaInfo, so a file is probed once until it changes.
+MEDIA_INFO_CACHE: OrderedDict[tuple[str, int, int], MediaInfo] = OrderedDict()
+
+MEDIA_INFO_CACHE_SIZE = 256
+
+
+async def probe_media(path: str) -> MediaInfo:
+    """Run ffprobe once for duration, audio and dimensions instead of a process per detail."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    if key in MEDIA_INFO_CACHE:
+        MEDIA_INFO_CACHE.move_to_end(key)
+        return MEDIA_INFO_CACHE[key]
+
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe",
+        "-v",
+        "error",
+        "-print_format",
+        "json",
+        "-show_entries",
+        "format=duration:stream=codec_type,width,height",
+        path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await process.communicate()
+
+    try:
+        data = json.loads(stdout or b"{}")
+    except json.JSONDecodeError:
+        data = {}
+
+    streams = data.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+
+    media_info = MediaInfo(
+        duration=int(float(data.get("format", {}).get("duration") or 0)),
+        has_audio=any(stream.get("codec_type") == "audio" for stream in streams),
+        width=video.get("width", 0),
+        height=video.get("height", 0),
+    )
+
+    MEDIA_INFO_CACHE[key] = media_info
+    if len(MEDIA_INFO_CACHE) > MEDIA_INFO_CACHE_SIZE:
+        MEDIA_INFO_CACHE.popitem(last=False)
+    return media_info
+
+
+async def get_thumbnail(path: str, media_info: MediaInfo) -> str | None:
+    """Grab a single frame at the probed timestamp, once per cached MediaInfo."""
+    if media_info.thumb and os.path.isfile(media_info.thumb):
+        return media_info.thumb
+
+    thumb = f"{path}.jpg"
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-ss",
+        str(media_info.thumb_timestamp),
+        "-i",
+        path,
+        "-frames:v",
+        "1",
+        "-vf",
+        "scale=320:-2",
+        "-y",
+        thumb,
+    )
+    await process.wait()
+
+    if os.path.isfile(thumb):
+        media_info.thumb = thumb
+    return media_info.thumb
+
+
 async def video_upload(bot: BOT, file: DownloadedFile, has_spoiler: bool) -> UPLOAD_TYPES:
-    thumb = await take_ss(file.path, path=file.path)
-    if not await check_audio(file.path):
+    media_info = await probe_media(file.path)
+    thumb = await get_thumbnail(file.path, media_info)
+    if not media_info.has_audio:
         return partial(
             bot.send_animation,
             thumb=thumb,
             unsave=True,
             animation=file.path,
-            duration=await get_duration(file.path),
+            duration=media_info.duration,
+            width=media_info.width,
+            height=media_info.height,
             has_spoiler=has_spoiler,
         )
     return partial(
         bot.send_video,
         thumb=thumb,
         video=file.path,
-        duration=await get_duration(file.path),
+        duration=media_info.duration,
+        width=media_info.width,
+        height=media_info.height,
         has_spoiler=has_spoiler,
     )
 
@@ -46,7 +142,8 @@ async def photo_upload(bot: BOT, file: DownloadedFile, has_spoiler: bool) -> UPL
 
 
 async def audio_upload(bot: BOT, file: DownloadedFile, *_, **__) -> UPLOAD_TYPES:
-    return partial(bot.send_audio, audio=file.path, duration=await get_duration(file=file.path))
+    media_info = await probe_media(file.path)
+    return partial(bot.send_audio, audio=file.path, duration=media_info.duration)
 
 
 async def doc_upload(bot: BOT, file: DownloadedFile, *_, **__) -> UPLOAD_TYPES:
@@ -81,8 +178,10 @@ async def upload(bot: BOT, message: Message):
         -s: spoiler.
         -bulk: for folder upload.
         -r: file name regex [ to be used with -bulk only ]
+        -stream: send a URL straight to TG as a doc without saving it to disk.
     USAGE:
         .upload [-d] URL | Path to File | CMD
+        .upload -stream URL
         .upload -bulk downloads/videos
         .upload -bulk -d -s downloads/videos
         .upload -bulk -r -s downloads/videos/*.mp4 (only uploads mp4)
@@ -94,6 +193,7 @@ async def upload(bot: BOT, message: Message):
         return
 
     response = await message.reply("checking input...")
+    source_url: str | None = None
 
     if input in Config.CMD_DICT:
         await message.reply_document(document=Config.CMD_DICT[input].cmd_path)
@@ -102,6 +202,26 @@ async def upload(bot: BOT, message: Message):
 
     elif input.startswith("http") and not file_exists(input):
 
+        if await send_from_cache(key=get_url_cache_key(input, message), message=message):
+            await response.delete()
+            return
+
+        if "-stream" in message.flags:
+            try:
+                if await stream_url_to_tg(url=input, message=message, response=response):
+                    await response.delete()
+                    return
+            except asyncio.exceptions.CancelledError:
+                await response.edit("Cancelled...")
+                return
+            except asyncio.TimeoutError:
+                await response.edit("Stream timed out, the server stopped sending data.")
+                return
+            except Exception as e:
+                await response.edit(str(e))
+                return
+            await response.edit("File size unknown, can't stream. Downloading instead...")
+
         try:
             async with Download(
                 url=input, dir=os.path.join("downloads", str(time.time())), message_to_edit=response
@@ -125,6 +245,8 @@ async def upload(bot: BOT, message: Message):
             await response.edit(str(e))
             return
 
+        source_url = input
+
     elif file_exists(input):
         file = DownloadedFile(file=input)
 
@@ -141,7 +263,60 @@ async def upload(bot: BOT, message: Message):
         return
 
     await response.edit("Uploading....")
-    await upload_to_tg(file=file, message=message, response=response)
+    await upload_to_tg(file=file, message=message, response=response, source_url=source_url)
+
+
+class UploadPacer:
+    """Spaces out bulk upload sends, widens the gap after a FloodWait and eases back after."""
+
+    MIN_GAP = 0.5
+    MAX_GAP = 30
+
+    def __init__(self):
+        self.gap: float = self.MIN_GAP
+        self.next_send: float = 0
+
+    async def wait(self):
+        now = time.monotonic()
+        ready = max(self.next_send, now)
+        self.next_send = ready + self.gap
+        await asyncio.sleep(ready - now)
+
+    def flood_wait(self, seconds: int):
+        self.gap = min(self.gap * 2, self.MAX_GAP)
+        self.next_send = max(self.next_send, time.monotonic() + seconds)
+
+    def success(self):
+        self.gap = max(self.gap * 0.8, self.MIN_GAP)
+
+
+# Photos and videos up to this size (MB) are grouped into albums during bulk uploads.
+ALBUM_FILE_SIZE_LIMIT = 50
+
+ALBUM_SIZE = 10
+
+
+def group_into_albums(files: list[DownloadedFile], as_doc: bool) -> list[list[DownloadedFile]]:
+    """Split files into batches, runs of small photos/videos become albums of up to ALBUM_SIZE."""
+    batches: list[list[DownloadedFile]] = []
+    album: list[DownloadedFile] = []
+
+    for file in files:
+        if (
+            not as_doc
+            and file.type in {MediaType.PHOTO, MediaType.VIDEO}
+            and file.size <= ALBUM_FILE_SIZE_LIMIT
+        ):
+            album.append(file)
+            if len(album) == ALBUM_SIZE:
+                batches.append(album)
+                album = []
+            continue
+        batches.append([file])
+
+    if album:
+        batches.append(album)
+    return batches
 
 
 async def bulk_upload(message: Message, response: Message):
@@ -151,45 +326,239 @@ async def bulk_upload(message: Message, response: Message):
     else:
         path_regex = os.path.join(message.filtered_input, "*")
 
-    file_list = [f for f in glob.glob(path_regex) if file_exists(f)]
+    file_list = sorted(f for f in glob.glob(path_regex) if file_exists(f))
 
     if not file_list:
         await response.edit("Invalid Folder path/regex or Folder Empty")
         return
 
-    await response.edit(f"Preparing to upload {len(file_list)} files.")
+    files: list[DownloadedFile] = []
+    skipped: list[str] = []
 
     for file in file_list:
-
         file_info = DownloadedFile(file=file)
-
         if size_over_limit(file_info.size, client=message._client):
-            await response.reply(f"Skipping {file_info.name} due to size exceeding limit.")
-            continue
+            skipped.append(file_info.name)
+        else:
+            files.append(file_info)
 
-        temp_resp = await response.reply(f"starting to upload `{file_info.name}`")
+    await response.edit(f"Preparing to upload {len(files)} files.")
 
-        await upload_to_tg(file=file_info, message=message, response=temp_resp)
-        await asyncio.sleep(3)
+    stats = {"done": 0, "total": len(files), "failed": []}
+    pacer = UploadPacer()
+    semaphore = asyncio.Semaphore(extra_config.BULK_UPLOAD_CONCURRENCY)
+    status_task = asyncio.create_task(bulk_status_worker(response, stats))
 
-    await response.delete()
+    try:
+        await asyncio.gather(
+            *(
+                upload_batch(
+                    batch=batch, message=message, semaphore=semaphore, pacer=pacer, stats=stats
+                )
+                for batch in group_into_albums(files, as_doc="-d" in message.flags)
+            )
+        )
+    finally:
+        status_task.cancel()
+
+    summary = f"Uploaded <b>{stats['done'] - len(stats['failed'])}/{stats['total']}</b> files."
+    if skipped:
+        summary += "\n\n<b>Skipped</b> (size over limit):\n• " + "\n• ".join(skipped)
+    if stats["failed"]:
+        summary += "\n\n<b>Failed</b>:\n• " + "\n• ".join(stats["failed"])
+    await response.edit(summary)
+
+
+async def bulk_status_worker(response: Message, stats: dict):
+    last_text = ""
+    while True:
+        text = f"Uploading... <b>{stats['done']}/{stats['total']}</b> files done."
+        if text != last_text:
+            await response.edit(text)
+            last_text = text
+        await asyncio.sleep(8)
+
+
+async def upload_batch(
+    batch: list[DownloadedFile],
+    message: Message,
+    semaphore: asyncio.Semaphore,
+    pacer: UploadPacer,
+    stats: dict,
+):
+    has_spoiler = "-s" in message.flags
+    async with semaphore:
+        try:
+            if len(batch) > 1:
+                media = [await get_input_media(file, has_spoiler=has_spoiler) for file in batch]
+                upload_method = partial(message._client.send_media_group, media=media)
+            else:
+                upload_method = partial(
+                    await get_upload_method(file=batch[0], message=message), caption=batch[0].name
+                )
+
+            for attempt in range(3):
+                await pacer.wait()
+                try:
+                    await upload_method(
+                        chat_id=message.chat.id,
+                        reply_parameters=ReplyParameters(message_id=message.reply_id),
+                    )
+                    pacer.success()
+                    break
+                except FloodWait as e:
+                    pacer.flood_wait(e.value)
+                    if attempt == 2:
+                        raise
 
+        except asyncio.exceptions.CancelledError:
+            raise
 
-async def upload_to_tg(file: DownloadedFile, message: Message, response: Message):
+        except Exception as e:
+            stats["failed"].extend(f"{file.name}: {e}" for file in batch)
+
+        stats["done"] += len(batch)
+
+
+async def get_input_media(
+    file: DownloadedFile, has_spoiler: bool
+) -> InputMediaPhoto | InputMediaVideo:
+    if file.type == MediaType.PHOTO:
+        return InputMediaPhoto(media=file.path, caption=file.name, has_spoiler=has_spoiler)
+    media_info = await probe_media(file.path)
+    return InputMediaVideo(
+        media=file.path,
+        thumb=await get_thumbnail(file.path, media_info),
+        caption=file.name,
+        width=media_info.width,
+        height=media_info.height,
+        duration=media_info.duration,
+        has_spoiler=has_spoiler,
+    )
 
-    progress_args = (response, "Uploading...", file.path)
 
+async def get_upload_method(file: DownloadedFile, message: Message) -> UPLOAD_TYPES:
     if "-d" in message.flags:
-        upload_method = partial(
+        return partial(
             message._client.send_document, document=file.path, disable_content_type_detection=True
         )
-    else:
-        upload_method: UPLOAD_TYPES = await FILE_TYPE_MAP[file.type](
-            bot=message._client, file=file, has_spoiler="-s" in message.flags
+    return await FILE_TYPE_MAP[file.type](
+        bot=message._client, file=file, has_spoiler="-s" in message.flags
+    )
+
+
+FILE_ID_DB = CustomDB["UPLOAD_CACHE"]
+
+
+class FileIdCache:
+    """
+    Upload keys -> Telegram file ids of what was already sent.
+    Recent keys stay in memory, everything is kept in FILE_ID_DB so it survives restarts.
+    """
+
+    def __init__(self, size: int = 512):
+        self.size = size
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+
+    def remember(self, entry: dict):
+        self.entries[entry["_id"]] = entry
+        self.entries.move_to_end(entry["_id"])
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    async def get(self, key: str) -> dict | None:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        entry = await FILE_ID_DB.find_one({"_id": key})
+        if entry:
+            self.remember(entry)
+        return entry
+
+    async def add(self, keys: list[str], file_id: str | None, **extra):
+        if not file_id:
+            return
+        for key in keys:
+            entry = {"_id": key, "file_id": file_id, **extra}
+            self.remember(entry)
+            await FILE_ID_DB.add_data(entry)
+
+    async def drop(self, key: str):
+        self.entries.pop(key, None)
+        await FILE_ID_DB.delete_data(id=key)
+
+
+FILE_ID_CACHE = FileIdCache()
+
+
+def get_file_id(message: Message | None) -> str | None:
+    if not (message and message.media):
+        return None
+    return getattr(getattr(message, message.media.value, None), "file_id", None)
+
+
+def get_upload_mode(message: Message) -> str:
+    """Flags that change how a file is sent, re-sending by file id can't change these."""
+    return "".join(flag for flag in ("-d", "-s", "-stream") if flag in message.flags)
+
+
+def get_url_cache_key(url: str, message: Message) -> str:
+    return f"url:{url}|{get_upload_mode(message)}"
+
+
+async def get_file_cache_key(file: DownloadedFile, message: Message) -> str:
+    """Content hash plus name, so .rename of the same bytes still does a real upload."""
+
+    def sha256() -> str:
+        with open(file.path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    return f"sha256:{await asyncio.to_thread(sha256)}|{file.name}|{get_upload_mode(message)}"
+
+
+async def send_from_cache(key: str, message: Message) -> str | None:
+    """
+    Re-send an already uploaded file by its file id.
+
+    :return: The file id that was sent, None if nothing is cached or Telegram rejected it.
+    """
+    entry = await FILE_ID_CACHE.get(key)
+    if not entry:
+        return None
+
+    try:
+        await message._client.send_cached_media(
+            chat_id=message.chat.id,
+            file_id=entry["file_id"],
+            caption=entry.get("caption"),
+            reply_parameters=ReplyParameters(message_id=message.reply_id),
         )
+        return entry["file_id"]
+    except BadRequest:
+        await FILE_ID_CACHE.drop(key)
+        return None
+
+
+async def upload_to_tg(
+    file: DownloadedFile, message: Message, response: Message, source_url: str | None = None
+):
+
+    progress_args = (response, "Uploading...", file.path)
+
+    cache_keys = [await get_file_cache_key(file=file, message=message)]
+    if source_url:
+        cache_keys.append(get_url_cache_key(url=source_url, message=message))
+
+    if file_id := await send_from_cache(key=cache_keys[0], message=message):
+        await FILE_ID_CACHE.add(cache_keys[1:], file_id, caption=file.name)
+        await response.delete()
+        return
+
+    upload_method: UPLOAD_TYPES = await get_upload_method(file=file, message=message)
 
     try:
-        await upload_method(
+        uploaded: Message = await upload_method(
             chat_id=message.chat.id,
             reply_parameters=ReplyParameters(message_id=message.reply_id),
             progress=progress,
@@ -201,3 +570,185 @@ async def upload_to_tg(file: DownloadedFile, message: Message, response: Message
     except asyncio.exceptions.CancelledError:
         await response.edit("Cancelled....")
         raise
+
+    await FILE_ID_CACHE.add(cache_keys, get_file_id(uploaded), caption=file.name)
+
+
+# Every part but the last has to be exactly this size.
+TG_PART_SIZE = 524288
+
+# Files bigger than this have to be uploaded with SaveBigFilePart.
+TG_BIG_FILE_SIZE = 10485760
+
+# Parts buffered in memory between the download and the upload workers.
+STREAM_BUFFER_PARTS = 8
+
+STREAM_WORKERS = 4
+
+# No cap on the whole transfer, only on connecting and on a stalled socket.
+STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+
+
+async def stream_url_to_tg(url: str, message: Message, response: Message) -> bool:
+    """
+    Pipe a URL into a Telegram upload without staging it on disk.
+
+    :return: False if the server didn't send a size, parts can't be uploaded without one.
+    """
+    async with (
+        aiohttp.ClientSession(timeout=STREAM_TIMEOUT) as session,
+        session.get(url) as resp,
+    ):
+        if resp.status != 200:
+            raise Exception(f"Download failed with {resp.status}.")
+
+        size = resp.content_length
+        if not size:
+            return False
+
+        if size_over_limit(size / 1048576, client=message._client):
+            raise Exception("<b>Aborted</b>, File size exceeds TG Limits!!!")
+
+        file_name = (
+            (resp.content_disposition and resp.content_disposition.filename)
+            or unquote(os.path.basename(urlparse(url).path))
+            or "file"
+        )
+
+        sent = await stream_to_tg(
+            source=resp.content.iter_chunked(TG_PART_SIZE),
+            size=size,
+            file_name=file_name,
+            mime_type=resp.content_type,
+            message=message,
+            response=response,
+        )
+
+    await FILE_ID_CACHE.add(
+        [get_url_cache_key(url=url, message=message)], get_file_id(sent), caption=file_name
+    )
+    return True
+
+
+async def stream_to_tg(
+    source: AsyncIterator[bytes],
+    size: int,
+    file_name: str,
+    mime_type: str | None,
+    message: Message,
+    response: Message,
+) -> Message | None:
+    """
+    Upload bytes as they arrive and send them as a document.
+
+    Incoming chunks are cut into TG_PART_SIZE parts and pushed through a queue of
+    STREAM_BUFFER_PARTS to STREAM_WORKERS part uploaders, so memory stays bounded and the
+    transfer only takes as long as the slower side.
+    """
+    client = message._client
+    tg_file_id = client.rnd_id()
+    total_parts = max(math.ceil(size / TG_PART_SIZE), 1)
+    is_big = size > TG_BIG_FILE_SIZE
+
+    parts: asyncio.Queue[tuple[int, bytes] | None] = asyncio.Queue(maxsize=STREAM_BUFFER_PARTS)
+    store = {"uploaded": 0}
+
+    async def reader():
+        buffer = bytearray()
+        part_index = 0
+        received = 0
+
+        async for data in source:
+            received += len(data)
+            buffer.extend(data)
+            while len(buffer) >= TG_PART_SIZE:
+                await parts.put((part_index, bytes(buffer[:TG_PART_SIZE])))
+                del buffer[:TG_PART_SIZE]
+                part_index += 1
+
+        if buffer or not part_index:
+            await parts.put((part_index, bytes(buffer)))
+            part_index += 1
+
+        if received != size:
+            raise Exception(f"Expected {size} bytes for {file_name} but got {received}.")
+
+        for _ in range(STREAM_WORKERS):
+            await parts.put(None)
+
+    async def uploader():
+        while item := await parts.get():
+            part_index, data = item
+            if is_big:
+                query = raw.functions.upload.SaveBigFilePart(
+                    file_id=tg_file_id,
+                    file_part=part_index,
+                    file_total_parts=total_parts,
+                    bytes=data,
+                )
+            else:
+                query = raw.functions.upload.SaveFilePart(
+                    file_id=tg_file_id, file_part=part_index, bytes=data
+                )
+
+            for attempt in range(3):
+                try:
+                    if await client.invoke(query):
+                        break
+                except FloodWait as e:
+                    await asyncio.sleep(e.value)
+            else:
+                raise Exception(f"Telegram didn't accept part {part_index} of {file_name}.")
+
+            store["uploaded"] += len(data)
+
+    async def progress_worker():
+        while True:
+            await progress(
+                current_size=store["uploaded"],
+                total_size=size,
+                response=response,
+                action_str="Streaming to TG...",
+            )
+            await asyncio.sleep(5)
+
+    progress_task = asyncio.create_task(progress_worker())
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(reader())
+            for _ in range(STREAM_WORKERS):
+                group.create_task(uploader())
+    except ExceptionGroup as e:
+        raise e.exceptions[0]
+    finally:
+        progress_task.cancel()
+
+    if is_big:
+        input_file = raw.types.InputFileBig(id=tg_file_id, parts=total_parts, name=file_name)
+    else:
+        input_file = raw.types.InputFile(
+            id=tg_file_id, parts=total_parts, name=file_name, md5_checksum=""
+        )
+
+    updates = await client.invoke(
+        raw.functions.messages.SendMedia(
+            peer=await client.resolve_peer(message.chat.id),
+            media=raw.types.InputMediaUploadedDocument(
+                file=input_file,
+                mime_type=mime_type or "application/octet-stream",
+                attributes=[raw.types.DocumentAttributeFilename(file_name=file_name)],
+                force_file=True,
+            ),
+            message=file_name,
+            random_id=client.rnd_id(),
+            reply_to=(
+                raw.types.InputReplyToMessage(reply_to_msg_id=message.reply_id)
+                if message.reply_id
+                else None
+            ),
+        )
+    )
+
+    for update in getattr(updates, "updates", []):
+        if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+            return await client.get_messages(chat_id=message.chat.id, message_ids=update.message.id)
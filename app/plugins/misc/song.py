@@ -6,10 +6,12 @@ from time import time
 from urllib.parse import urlparse
 
 from pyrogram.enums import MessageEntityType
+from pyrogram.errors import BadRequest
 from pyrogram.types import InputMediaAudio
 from ub_core.utils import aio, run_shell_cmd
 
 from app import BOT, Message
+from app.plugins.files.upload import FILE_ID_CACHE, get_file_id
 
 domains = [
     "www.youtube.com",
@@ -56,6 +58,16 @@ async def song_dl(bot: BOT, message: Message):
 
     response: Message = await message.reply("Searching....")
 
+    cache_key = f"song:{query}"
+    if cached := await FILE_ID_CACHE.get(cache_key):
+        try:
+            await response.edit_media(
+                InputMediaAudio(media=cached["file_id"], caption=cached.get("caption"))
+            )
+            return
+        except BadRequest:
+            await FILE_ID_CACHE.drop(cache_key)
+
     download_path: Path = Path("downloads") / str(time())
 
     query_or_search: str = query if query.startswith("http") else f"ytsearch:{query}"
@@ -74,10 +86,12 @@ async def song_dl(bot: BOT, message: Message):
 
     await response.edit(f"`Uploading {audio_file.name}....`")
 
-    await response.edit_media(
+    caption = f"<a href={url}>{audio_file.name}</a>" if url else None
+
+    uploaded = await response.edit_media(
         InputMediaAudio(
             media=str(audio_file),
-            caption=f"<a href={url}>{audio_file.name}</a>" if url else None,
+            caption=caption,
             duration=int(song_info.get("duration", 0)),
             performer=song_info.get("channel", ""),
             thumb=await aio.in_memory_dl(song_info.get("thumbnail")),
@@ -86,6 +100,9 @@ async def song_dl(bot: BOT, message: Message):
 
     shutil.rmtree(download_path, ignore_errors=True)
 
+    cache_keys = [cache_key, f"song:{url}"] if url else [cache_key]
+    await FILE_ID_CACHE.add(cache_keys, get_file_id(uploaded), caption=caption)
+
 
 async def get_download_info(query: str, path: Path) -> dict:
     download_cmd = (
@@ -1,17 +1,25 @@
 import asyncio
-from collections import defaultdict
+import heapq
+import json
+import re
+import time
+from collections import defaultdict, deque
+from pathlib import Path
 
 from pyrogram import filters
-from pyrogram.enums import ChatType, MessageEntityType, ParseMode
-from pyrogram.errors import MessageIdInvalid
+from pyrogram.enums import ChatType, ParseMode
+from pyrogram.errors import FloodWait, MessageIdInvalid
+from pyrogram.types import ReplyParameters
 from ub_core.utils.helpers import get_name
 
 from app import BOT, Config, CustomDB, Message, bot, extra_config
 
 LOGGER = CustomDB["COMMON_SETTINGS"]
 
-MESSAGE_CACHE: dict[int, list[Message]] = defaultdict(list)
-FLOOD_LIST: list[int] = []
+# chat id -> messages waiting to be logged, a key exists only while it has messages.
+MESSAGE_CACHE: dict[int, deque[Message]] = {}
+
+FLOOD_LIST: set[int] = set()
 
 
 async def init_task():
@@ -65,159 +73,539 @@ BASIC_FILTERS = (
 )
 
 
-@bot.on_message(
-    filters=BASIC_FILTERS
-    & filters.private
-    & filters.create(lambda _, __, ___: extra_config.PM_LOGGER),
-)
+# Cheapest checks first, the AND filters short-circuit left to right.
+PM_FILTER = filters.create(lambda _, __, ___: extra_config.PM_LOGGER)
+
+TAG_FILTER = filters.create(lambda _, __, ___: extra_config.TAG_LOGGER)
+
+
+@bot.on_message(filters=PM_FILTER & filters.private & BASIC_FILTERS)
 async def pm_logger(bot: BOT, message: Message):
     cache_message(message)
 
 
-TAG_FILTER = filters.create(lambda _, __, ___: extra_config.TAG_LOGGER)
+USERNAME_REGEX = (
+    re.compile(rf"@{re.escape(bot.me.username)}\b", re.IGNORECASE) if bot.me.username else None
+)
 
 
-@bot.on_message(
-    filters=(BASIC_FILTERS & filters.reply & TAG_FILTER) & ~filters.private,
-)
-async def reply_logger(bot: BOT, message: Message):
-    if (
-        message.reply_to_message
-        and message.reply_to_message.from_user
-        and message.reply_to_message.from_user.id == bot.me.id
-    ):
-        cache_message(message)
-    message.continue_propagation()
+def is_tag(message: Message) -> bool:
+    """Replied to, text-mentioned or @username-mentioned, checked in that order."""
+    reply = message.reply_to_message
+    if reply and reply.from_user and reply.from_user.id == bot.me.id:
+        return True
 
+    if message.mentioned:
+        for entity in message.entities or message.caption_entities or []:
+            if entity.user and entity.user.id == bot.me.id:
+                return True
 
-@bot.on_message(
-    filters=(BASIC_FILTERS & filters.mentioned & TAG_FILTER) & ~filters.private,
-)
-async def mention_logger(bot: BOT, message: Message):
-    for entity in message.entities or []:
-        if entity.type == MessageEntityType.MENTION and entity.user and entity.user.id == bot.me.id:
-            cache_message(message)
-    message.continue_propagation()
+    if USERNAME_REGEX:
+        text = message.text or message.caption
+        return bool(text and USERNAME_REGEX.search(text))
 
+    return False
 
-@bot.on_message(
-    filters=(BASIC_FILTERS & (filters.text | filters.media) & TAG_FILTER) & ~filters.private,
-)
-async def username_logger(bot: BOT, message: Message):
-    text = message.text or message.caption or ""
-    if bot.me.username and f"@{bot.me.username}" in text:
+
+@bot.on_message(filters=TAG_FILTER & ~filters.private & BASIC_FILTERS)
+async def tag_logger(bot: BOT, message: Message):
+    if is_tag(message):
         cache_message(message)
     message.continue_propagation()
 
 
 def cache_message(message: Message):
     chat_id = message.chat.id
-    if len(MESSAGE_CACHE[chat_id]) >= 10 and chat_id not in FLOOD_LIST:
-        bot.log.error(f"Message not Logged from chat: {get_name(message.chat)}")
-        FLOOD_LIST.append(chat_id)
+    cache = MESSAGE_CACHE.get(chat_id)
+    if (cache and len(cache) == cache.maxlen) or OVERFLOW.has(chat_id):
+        if chat_id not in FLOOD_LIST:
+            bot.log.error(f"Spilling messages to disk from chat: {get_name(message.chat)}")
+            FLOOD_LIST.add(chat_id)
+        if not OVERFLOW.push(message):
+            bot.log.error(f"Message not Logged from chat: {get_name(message.chat)}")
         return
-    if chat_id in FLOOD_LIST:
-        FLOOD_LIST.remove(chat_id)
+    FLOOD_LIST.discard(chat_id)
+    add_to_cache(chat_id, message)
+
+
+def add_to_cache(chat_id: int, message: Message):
+    if chat_id not in MESSAGE_CACHE:
+        MESSAGE_CACHE[chat_id] = deque(maxlen=extra_config.MESSAGE_LOGGER_CACHE_LIMIT)
+        SCHEDULER.add(chat_id, private=message.chat.type == ChatType.PRIVATE)
     MESSAGE_CACHE[chat_id].append(message)
 
 
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens: float = burst
+        self.updated = time.monotonic()
+
+    def available(self) -> int:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return int(self.tokens)
+
+    def take(self, count: int):
+        self.available()
+        self.tokens -= count
+
+    def wait_time(self) -> float:
+        """Seconds until at least one token is available."""
+        self.available()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    @property
+    def is_full(self) -> bool:
+        return self.available() >= self.burst
+
+
+class LogScheduler:
+    """
+    Picks the next chat in MESSAGE_CACHE to log.
+
+    PMs get PM_WEIGHT turns for every turn tags get, and every chat drains through its
+    own token bucket, so a group flooding mentions only slows down its own logs.
+    Chats out of tokens wait in a heap until they refill instead of being polled.
+    """
+
+    PM_WEIGHT = 3
+    PM_RATE, PM_BURST = 1, 30
+    TAG_RATE, TAG_BURST = 0.5, 20
+
+    def __init__(self):
+        self.pm_queue: deque[int] = deque()
+        self.tag_queue: deque[int] = deque()
+        self.throttled: list[tuple[float, int]] = []
+        self.private_chats: set[int] = set()
+        self.buckets: dict[int, TokenBucket] = {}
+        self.pm_turns = 0
+
+    def add(self, chat_id: int, private: bool):
+        if chat_id not in self.buckets:
+            if private:
+                self.buckets[chat_id] = TokenBucket(rate=self.PM_RATE, burst=self.PM_BURST)
+            else:
+                self.buckets[chat_id] = TokenBucket(rate=self.TAG_RATE, burst=self.TAG_BURST)
+        if private:
+            self.private_chats.add(chat_id)
+        self.requeue(chat_id)
+
+    def requeue(self, chat_id: int):
+        bucket = self.buckets[chat_id]
+        if bucket.available() < 1:
+            heapq.heappush(self.throttled, (time.monotonic() + bucket.wait_time(), chat_id))
+        elif chat_id in self.private_chats:
+            self.pm_queue.append(chat_id)
+        else:
+            self.tag_queue.append(chat_id)
+
+    def next(self) -> tuple[int, int] | None:
+        """:return: The chat to log next and how many of its messages can go out now."""
+        now = time.monotonic()
+        while self.throttled and self.throttled[0][0] <= now:
+            self.requeue(heapq.heappop(self.throttled)[1])
+
+        if self.pm_queue and (self.pm_turns < self.PM_WEIGHT or not self.tag_queue):
+            self.pm_turns += 1
+            chat_id = self.pm_queue.popleft()
+        elif self.tag_queue:
+            self.pm_turns = 0
+            chat_id = self.tag_queue.popleft()
+        else:
+            return None
+
+        return chat_id, self.buckets[chat_id].available()
+
+    def done(self, chat_id: int, sent: int, pending: bool):
+        self.buckets[chat_id].take(sent)
+        if pending:
+            self.requeue(chat_id)
+        else:
+            self.private_chats.discard(chat_id)
+
+    def next_release_in(self) -> float | None:
+        if self.throttled:
+            return max(0.0, self.throttled[0][0] - time.monotonic())
+
+    def prune(self):
+        """Forget refilled buckets of chats with nothing waiting."""
+        for chat_id in [c for c, b in self.buckets.items() if c not in MESSAGE_CACHE and b.is_full]:
+            self.buckets.pop(chat_id)
+
+
+SCHEDULER = LogScheduler()
+
+
+def snapshot_message(message: Message) -> dict:
+    """Enough of a message to log it even if it is deleted before it is fetched again."""
+    if message.sender_chat:
+        sender, sender_id = message.sender_chat.title, message.sender_chat.id
+    else:
+        sender, sender_id = message.from_user.mention, message.from_user.id
+
+    media = getattr(message, message.media.value, None) if message.media else None
+
+    return {
+        "chat_id": message.chat.id,
+        "message_id": message.id,
+        "private": message.chat.type == ChatType.PRIVATE,
+        "chat_name": message.chat.title or message.chat.first_name,
+        "link": message.link,
+        "sender": sender,
+        "sender_id": sender_id,
+        "text": message.text and message.text.html,
+        "caption": message.caption and message.caption.html,
+        "file_id": getattr(media, "file_id", None),
+    }
+
+
+class OverflowQueue:
+    """
+    Bounded on-disk spill for messages that don't fit in MESSAGE_CACHE.
+    Each entry is a snapshot_message of the message, they are fetched again when loaded
+    and the snapshot is logged instead if the message was deleted in the meantime.
+    """
+
+    def __init__(self, path: Path, limit: int):
+        self.path = path
+        self.limit = limit
+        self.entries: deque[dict] = deque()
+        self.chat_counts: dict[int, int] = defaultdict(int)
+        # Chats being fetched back, new messages keep spilling so they stay in order.
+        self.loading: set[int] = set()
+
+        if path.is_file():
+            for line in path.read_text().splitlines():
+                entry = json.loads(line)
+                if isinstance(entry, list):
+                    # Spilled before snapshots were stored, only the ids are known.
+                    entry = {"chat_id": entry[0], "message_id": entry[1]}
+                self.entries.append(entry)
+                self.chat_counts[entry["chat_id"]] += 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def has(self, chat_id: int) -> bool:
+        return chat_id in self.chat_counts or chat_id in self.loading
+
+    def push(self, message: Message) -> bool:
+        """:return: False if the queue is full and the message was dropped."""
+        if len(self.entries) >= self.limit:
+            return False
+
+        entry = snapshot_message(message)
+        self.entries.append(entry)
+        self.chat_counts[entry["chat_id"]] += 1
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a") as file:
+            file.write(json.dumps(entry) + "\n")
+        return True
+
+    def pop_chat(self, limit: int, chat_id: int | None = None) -> tuple[int, list[dict]]:
+        """
+        Take up to limit entries of a spilled chat, in the order they came in.
+
+        :param chat_id: Chat to take from, the oldest spilled one if not given.
+        """
+        if chat_id is None:
+            chat_id = self.entries[0]["chat_id"]
+        taken: list[dict] = []
+        remaining: deque[dict] = deque()
+
+        for entry in self.entries:
+            if entry["chat_id"] == chat_id and len(taken) < limit:
+                taken.append(entry)
+            else:
+                remaining.append(entry)
+
+        self.entries = remaining
+        self.chat_counts[chat_id] -= len(taken)
+        if not self.chat_counts[chat_id]:
+            self.chat_counts.pop(chat_id)
+
+        self.path.write_text("".join(json.dumps(entry) + "\n" for entry in self.entries))
+        return chat_id, taken
+
+
+OVERFLOW = OverflowQueue(
+    path=Path("logs/message_logger_overflow.jsonl"),
+    limit=extra_config.MESSAGE_LOGGER_OVERFLOW_LIMIT,
+)
+
+
+class LogPacer:
+    """Spaces out calls to the log chat, backs off after a FloodWait and eases back on success."""
+
+    MIN_GAP = 1
+    MAX_GAP = 60
+
+    def __init__(self):
+        self.gap: float = self.MIN_GAP
+
+    async def call(self, func, *args, **kwargs):
+        while True:
+            try:
+                result = await func(*args, **kwargs)
+            except FloodWait as e:
+                self.gap = min(self.gap * 2, self.MAX_GAP)
+                await asyncio.sleep(e.value + 1)
+                continue
+
+            self.gap = max(self.gap * 0.8, self.MIN_GAP)
+            await asyncio.sleep(self.gap)
+            return result
+
+
+PACER = LogPacer()
+
+# Max messages forwarded in one forward_messages call.
+FORWARD_BATCH_SIZE = 100
+
+
 async def runner():
     if not (extra_config.TAG_LOGGER or extra_config.PM_LOGGER):
         return
     last_pm_logged_id = 0
 
     while True:
-        cached_keys = list(MESSAGE_CACHE.keys())
-        if not cached_keys:
-            await asyncio.sleep(5)
+        picked = SCHEDULER.next()
+        if not picked:
+            if MESSAGE_CACHE:
+                # Short naps so a new PM doesn't wait on a throttled group's refill.
+                await asyncio.sleep(min(SCHEDULER.next_release_in() or 0, 1) or 0.1)
+            elif OVERFLOW:
+                await load_overflow()
+            else:
+                SCHEDULER.prune()
+                await asyncio.sleep(5)
             continue
 
-        first_key = cached_keys[0]
-        cached_list = MESSAGE_CACHE.copy()[first_key]
-        if not cached_list:
-            MESSAGE_CACHE.pop(first_key)
+        chat_id, limit = picked
+        cache = MESSAGE_CACHE[chat_id]
+        cached_list = [cache.popleft() for _ in range(min(len(cache), limit, FORWARD_BATCH_SIZE))]
 
-        for idx, msg in enumerate(cached_list):
-            if msg.chat.type == ChatType.PRIVATE:
+        if not cache:
+            MESSAGE_CACHE.pop(chat_id)
+        SCHEDULER.done(chat_id, sent=len(cached_list), pending=bool(cache))
 
-                if last_pm_logged_id != first_key:
-                    last_pm_logged_id = first_key
-                    log_info = True
-                else:
-                    log_info = False
+        log_info = last_pm_logged_id != chat_id
+        if cached_list[0].chat.type == ChatType.PRIVATE:
+            last_pm_logged_id = chat_id
+            coro = log_pms(messages=cached_list, log_info=log_info)
+        else:
+            coro = log_chats(messages=cached_list)
 
-                coro = log_pm(message=msg, log_info=log_info)
+        try:
+            await coro
+        except Exception:
+            pass
 
-            else:
-                coro = log_chat(message=msg)
+        if OVERFLOW.has(chat_id):
+            # Refill as the chat drains instead of waiting for the whole cache to empty.
+            room = extra_config.MESSAGE_LOGGER_CACHE_LIMIT - len(MESSAGE_CACHE.get(chat_id, ()))
+            await load_overflow(chat_id=chat_id, limit=room)
 
-            try:
-                await coro
-            except BaseException:
-                pass
 
-            MESSAGE_CACHE[first_key].remove(msg)
-            await asyncio.sleep(5)
+async def load_overflow(chat_id: int | None = None, limit: int | None = None):
+    """
+    Move spilled messages back into MESSAGE_CACHE,
+    the ones deleted since are logged from their snapshot.
 
-        await asyncio.sleep(15)
+    :param chat_id: Chat to reload, the oldest spilled one if not given.
+    :param limit: Max messages to reload, defaults to a full cache.
+    """
+    if limit is None:
+        limit = extra_config.MESSAGE_LOGGER_CACHE_LIMIT
 
+    chat_id, entries = OVERFLOW.pop_chat(limit=limit, chat_id=chat_id)
+    if not entries:
+        return
 
-async def log_pm(message: Message, log_info: bool):
-    if log_info:
-        await bot.send_message(
+    OVERFLOW.loading.add(chat_id)
+    try:
+        messages = await PACER.call(
+            bot.get_messages,
+            chat_id=chat_id,
+            message_ids=[entry["message_id"] for entry in entries],
+        )
+        alive_ids = set()
+        for msg in messages:
+            if not msg.empty:
+                alive_ids.add(msg.id)
+                add_to_cache(chat_id, Message(message=msg))
+    except Exception as e:
+        bot.log.error(f"{len(entries)} spilled messages from {chat_id} not Logged: {e}")
+        return
+    finally:
+        OVERFLOW.loading.discard(chat_id)
+
+    for entry in entries:
+        if entry["message_id"] not in alive_ids and "link" in entry:
+            try:
+                await log_deleted_snapshot(entry)
+            except Exception as e:
+                bot.log.error(f"Deleted message {entry['link']} not Logged: {e}")
+
+
+async def log_deleted_snapshot(entry: dict):
+    """Re-send a spilled message that was deleted before it was logged, with a notice."""
+    if entry["private"]:
+        thread_id = extra_config.PM_LOGGER_THREAD_ID
+    else:
+        thread_id = extra_config.TAG_LOGGER_THREAD_ID
+
+    if entry["file_id"]:
+        logged_message = await PACER.call(
+            bot.send_cached_media,
             chat_id=extra_config.MESSAGE_LOGGER_CHAT,
-            text=f"#PM\n{message.from_user.mention} [{message.from_user.id}]",
-            message_thread_id=extra_config.PM_LOGGER_THREAD_ID,
+            file_id=entry["file_id"],
+            caption=entry["caption"] or "",
+            parse_mode=ParseMode.HTML,
+            message_thread_id=thread_id,
         )
+    else:
+        logged_message = await PACER.call(
+            bot.send_message,
+            chat_id=extra_config.MESSAGE_LOGGER_CHAT,
+            text=entry["text"] or "No text in message.",
+            parse_mode=ParseMode.HTML,
+            message_thread_id=thread_id,
+        )
+
     notice = (
-        f"{message.from_user.mention} [{message.from_user.id}] deleted this message."
+        f"{entry['sender']} [{entry['sender_id']}] deleted this message."
         f"\n\n---\n\n"
-        f"Message: \n<a href='{message.link}'>{message.chat.title or message.chat.first_name}</a> ({message.chat.id})"
+        f"Message: \n<a href='{entry['link']}'>{entry['chat_name']}</a> ({entry['chat_id']})"
         f"\n\n---\n\n"
-        f"Caption:\n{message.caption or 'No Caption in media.'}"
+        f"Caption:\n{entry['caption'] or 'No Caption in media.'}"
     )
-    await log_message(message=message, notice=notice, thread_id=extra_config.PM_LOGGER_THREAD_ID)
+    await PACER.call(logged_message.reply, notice, parse_mode=ParseMode.HTML)
 
 
-async def log_chat(message: Message):
-    if message.sender_chat:
-        mention, u_id = message.sender_chat.title, message.sender_chat.id
-    else:
-        mention, u_id = message.from_user.mention, message.from_user.id
-    notice = (
-        f"{mention} [{u_id}] deleted this message."
-        f"\n\n---\n\n"
-        f"Message: \n<a href='{message.link}'>{message.chat.title or message.chat.first_name}</a> ({message.chat.id})"
-        f"\n\n---\n\n"
-        f"Caption:\n{message.caption or 'No Caption in media.'}"
+async def log_pms(messages: list[Message], log_info: bool):
+    first = messages[0]
+    if log_info:
+        await PACER.call(
+            bot.send_message,
+            chat_id=extra_config.MESSAGE_LOGGER_CHAT,
+            text=f"#PM\n{first.from_user.mention} [{first.from_user.id}]",
+            message_thread_id=extra_config.PM_LOGGER_THREAD_ID,
+        )
+
+    forwarded, deleted = await forward_messages(
+        messages=messages, thread_id=extra_config.PM_LOGGER_THREAD_ID
     )
 
-    if message.reply_to_message:
-        await log_message(message.reply_to_message, thread_id=extra_config.TAG_LOGGER_THREAD_ID)
+    for message in deleted:
+        notice = (
+            f"{message.from_user.mention} [{message.from_user.id}] deleted this message."
+            f"\n\n---\n\n"
+            f"Message: \n<a href='{message.link}'>{message.chat.title or message.chat.first_name}</a> ({message.chat.id})"
+            f"\n\n---\n\n"
+            f"Caption:\n{message.caption or 'No Caption in media.'}"
+        )
+        await copy_message(
+            message=message, notice=notice, thread_id=extra_config.PM_LOGGER_THREAD_ID
+        )
+
+
+async def log_chats(messages: list[Message]):
+    # Replied-to messages go right before the tag, like they show up in the chat.
+    tag_ids = {message.id for message in messages}
+    to_forward: list[Message] = []
+    for message in messages:
+        reply = message.reply_to_message
+        if reply and reply.id not in tag_ids:
+            to_forward.append(reply)
+        to_forward.append(message)
 
-    await log_message(
-        message=message,
-        notice=notice,
-        extra_info=f"#TAG\n{mention} [{u_id}]\nMessage: \n<a href='{message.link}'>{message.chat.title}</a> ({message.chat.id})",
-        thread_id=extra_config.TAG_LOGGER_THREAD_ID,
+    forwarded, deleted = await forward_messages(
+        messages=to_forward, thread_id=extra_config.TAG_LOGGER_THREAD_ID
     )
+    deleted_ids = {message.id for message in deleted}
+
+    for message in to_forward:
+        if message.id not in tag_ids:
+            if message.id in deleted_ids:
+                await copy_message(message=message, thread_id=extra_config.TAG_LOGGER_THREAD_ID)
+            continue
+
+        if message.sender_chat:
+            mention, u_id = message.sender_chat.title, message.sender_chat.id
+        else:
+            mention, u_id = message.from_user.mention, message.from_user.id
+
+        if message.id in deleted_ids:
+            notice = (
+                f"{mention} [{u_id}] deleted this message."
+                f"\n\n---\n\n"
+                f"Message: \n<a href='{message.link}'>{message.chat.title or message.chat.first_name}</a> ({message.chat.id})"
+                f"\n\n---\n\n"
+                f"Caption:\n{message.caption or 'No Caption in media.'}"
+            )
+            await copy_message(
+                message=message, notice=notice, thread_id=extra_config.TAG_LOGGER_THREAD_ID
+            )
+            continue
+
+        logged_message = forwarded.get(message.id)
+        await PACER.call(
+            bot.send_message,
+            chat_id=extra_config.MESSAGE_LOGGER_CHAT,
+            text=f"#TAG\n{mention} [{u_id}]\nMessage: \n<a href='{message.link}'>{message.chat.title}</a> ({message.chat.id})",
+            parse_mode=ParseMode.HTML,
+            reply_parameters=(
+                ReplyParameters(message_id=logged_message.id) if logged_message else None
+            ),
+            message_thread_id=extra_config.TAG_LOGGER_THREAD_ID,
+        )
 
 
-async def log_message(
-    message: Message,
-    notice: str | None = None,
-    extra_info: str | None = None,
-    thread_id: int = None,
-):
+async def forward_messages(
+    messages: list[Message], thread_id: int = None
+) -> tuple[dict[int, Message], list[Message]]:
+    """
+    Forward messages of a single chat in one call.
+
+    :return: source message id -> logged message, and the messages that were deleted
+        and need to be copied from the cache instead.
+    """
+    chat_id = messages[0].chat.id
+    message_ids = list(dict.fromkeys(message.id for message in messages))
+
+    current = await PACER.call(bot.get_messages, chat_id=chat_id, message_ids=message_ids)
+    alive_ids = [msg.id for msg in current if not msg.empty]
+    deleted = [message for message in messages if message.id not in alive_ids]
+
+    if not alive_ids:
+        return {}, deleted
+
     try:
-        logged_message: Message = await message.forward(
-            extra_config.MESSAGE_LOGGER_CHAT, message_thread_id=thread_id
+        logged = await PACER.call(
+            bot.forward_messages,
+            chat_id=extra_config.MESSAGE_LOGGER_CHAT,
+            from_chat_id=chat_id,
+            message_ids=alive_ids,
+            message_thread_id=thread_id,
         )
-        if extra_info:
-            await logged_message.reply(extra_info, parse_mode=ParseMode.HTML)
     except MessageIdInvalid:
-        logged_message = await message.copy(
-            extra_config.MESSAGE_LOGGER_CHAT, message_thread_id=thread_id
-        )
-        if notice:
-            await logged_message.reply(notice, parse_mode=ParseMode.HTML)
+        return {}, [message for message in messages if message.id in alive_ids] + deleted
+
+    # Something got deleted in between, logs still go out but can't be paired up.
+    if len(logged) != len(alive_ids):
+        return {}, deleted
+
+    return dict(zip(alive_ids, logged)), deleted
+
+
+async def copy_message(message: Message, notice: str | None = None, thread_id: int = None):
+    logged_message: Message = await PACER.call(
+        message.copy, extra_config.MESSAGE_LOGGER_CHAT, message_thread_id=thread_id
+    )
+    if notice:
+        await PACER.call(logged_message.reply, notice, parse_mode=ParseMode.HTML)
@@ -1,23 +1,137 @@
 import asyncio
-from collections import defaultdict
+import time
+from collections import OrderedDict, deque
 
 from pyrogram import filters
 from pyrogram.enums import ChatType
+from pymongo import DeleteOne, ReplaceOne
 from ub_core.utils.helpers import get_name
 
-from app import BOT, CustomDB, Message, bot, extra_config
+from app import BOT, Config, CustomDB, Message, bot, extra_config
 
 PM_USERS = CustomDB["PM_USERS"]
 PM_GUARD = CustomDB["COMMON_SETTINGS"]
 
-ALLOWED_USERS: list[int] = []
-RECENT_USERS: dict = defaultdict(int)
+ALLOWED_USERS: set[int] = set()
+
+
+class SpamTracker:
+    """
+    Messages per user in a sliding window.
+    Users idle for longer than the window are evicted, and the least recently
+    active ones go first once max_users is reached, so a spam wave can't grow it forever.
+    """
+
+    def __init__(self, window: float, threshold: int, max_users: int = 10000):
+        self.window = window
+        self.threshold = threshold
+        self.max_users = max_users
+        # Only the last `threshold` timestamps matter, ordered by last activity.
+        self.users: OrderedDict[int, deque[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def hit(self, user_id: int) -> int:
+        """Record a message and return how many the user sent within the window."""
+        now = time.monotonic()
+        self.evict(now)
+
+        timestamps = self.users.get(user_id)
+        if timestamps is None:
+            timestamps = self.users[user_id] = deque(maxlen=self.threshold)
+        else:
+            self.users.move_to_end(user_id)
+
+        timestamps.append(now)
+        while timestamps[0] <= now - self.window:
+            timestamps.popleft()
+        return len(timestamps)
+
+    def evict(self, now: float):
+        while self.users:
+            user_id, timestamps = next(iter(self.users.items()))
+            if len(self.users) < self.max_users and timestamps[-1] > now - self.window:
+                break
+            self.users.popitem(last=False)
+
+    def reset(self, user_id: int):
+        self.users.pop(user_id, None)
+
+
+RECENT_USERS = SpamTracker(
+    window=extra_config.PM_GUARD_SPAM_WINDOW, threshold=extra_config.PM_GUARD_SPAM_THRESHOLD
+)
+
+# user id -> True to save, False to delete, written to PM_USERS in bulk by pm_users_writer.
+PENDING_WRITES: dict[int, bool] = {}
+PENDING_WRITES_EVENT = asyncio.Event()
+WRITE_DELAY = 5
 
 
 async def init_task():
     guard = (await PM_GUARD.find_one({"_id": "guard_switch"})) or {}
     extra_config.PM_GUARD = guard.get("value", False)
-    [ALLOWED_USERS.append(user_id["_id"]) async for user_id in PM_USERS.find()]
+
+    snapshot = await PM_GUARD.find_one({"_id": "pm_users_snapshot"})
+    if snapshot:
+        ALLOWED_USERS.update(snapshot["users"])
+    else:
+        ALLOWED_USERS.update([user_id["_id"] async for user_id in PM_USERS.find()])
+        await save_snapshot()
+
+    Config.BACKGROUND_TASKS.append(asyncio.create_task(pm_users_writer(), name="pm_users_writer"))
+    Config.EXIT_TASKS.append(flush_pending_writes)
+
+
+def set_allowed(user_id: int, allowed: bool):
+    """Update the allow list right away and queue the DB write."""
+    if allowed:
+        ALLOWED_USERS.add(user_id)
+    else:
+        ALLOWED_USERS.discard(user_id)
+    PENDING_WRITES[user_id] = allowed
+    PENDING_WRITES_EVENT.set()
+
+
+async def pm_users_writer():
+    while True:
+        await PENDING_WRITES_EVENT.wait()
+        # Let approvals and revocations that come close together pile up into one write.
+        await asyncio.sleep(WRITE_DELAY)
+        await flush_pending_writes()
+
+
+async def flush_pending_writes():
+    PENDING_WRITES_EVENT.clear()
+    if not PENDING_WRITES:
+        return
+
+    writes = PENDING_WRITES.copy()
+    PENDING_WRITES.clear()
+
+    operations = [
+        (
+            ReplaceOne({"_id": user_id}, {"_id": user_id}, upsert=True)
+            if allowed
+            else DeleteOne({"_id": user_id})
+        )
+        for user_id, allowed in writes.items()
+    ]
+    try:
+        await PM_USERS.bulk_write(operations, ordered=False)
+        await save_snapshot()
+    except Exception as e:
+        # Keep newer changes made while writing, retry the rest on the next round.
+        for user_id, allowed in writes.items():
+            PENDING_WRITES.setdefault(user_id, allowed)
+        PENDING_WRITES_EVENT.set()
+        bot.log.error(f"Failed to save PM users: {e}")
+
+
+async def save_snapshot():
+    """Single doc copy of PM_USERS so boot needs one read instead of a full scan."""
+    await PM_GUARD.add_data({"_id": "pm_users_snapshot", "users": list(ALLOWED_USERS)})
 
 
 async def pm_permit_filter(_, __, message: Message):
@@ -48,36 +162,33 @@ PERMIT_FILTER = filters.create(pm_permit_filter)
 @bot.on_message(PERMIT_FILTER & filters.incoming, group=0)
 async def handle_new_pm(bot: BOT, message: Message):
     user_id = message.from_user.id
-    if RECENT_USERS[user_id] == 0:
+    message_count = RECENT_USERS.hit(user_id)
+    if message_count == 1:
         await bot.log_text(
             text=f"#PMGUARD\n{message.from_user.mention} [{user_id}] has messaged you.", type="info"
         )
-    RECENT_USERS[user_id] += 1
 
     if message.chat.is_support:
         return
 
-    if RECENT_USERS[user_id] >= 5:
+    if message_count >= RECENT_USERS.threshold:
         await message.reply("You've been blocked for spamming.")
         await bot.block_user(user_id)
-        RECENT_USERS.pop(user_id)
+        RECENT_USERS.reset(user_id)
         await bot.log_text(
             text=f"#PMGUARD\n{message.from_user.mention} [{user_id}] has been blocked for spamming.",
             type="info",
         )
         return
-    if RECENT_USERS[user_id] % 2:
+    if message_count % 2:
         await message.reply("You are not authorised to PM.")
 
 
 @bot.on_message(PERMIT_FILTER & filters.outgoing, group=2)
 async def auto_approve(bot: BOT, message: Message):
     message = Message(message=message)
-    ALLOWED_USERS.append(message.chat.id)
-    await asyncio.gather(
-        PM_USERS.insert_one({"_id": message.chat.id}),
-        message.reply(text="Auto-Approved to PM.", del_in=5),
-    )
+    set_allowed(message.chat.id, allowed=True)
+    await message.reply(text="Auto-Approved to PM.", del_in=5)
 
 
 @bot.add_cmd(cmd="pmguard")
@@ -116,12 +227,9 @@ async def allow_pm(bot: BOT, message: Message):
     if user_id in ALLOWED_USERS:
         await message.reply(f"{name} is already approved.")
         return
-    ALLOWED_USERS.append(user_id)
-    RECENT_USERS.pop(user_id, 0)
-    await asyncio.gather(
-        message.reply(text=f"{name} allowed to PM.", del_in=8),
-        PM_USERS.insert_one({"_id": user_id}),
-    )
+    set_allowed(user_id, allowed=True)
+    RECENT_USERS.reset(user_id)
+    await message.reply(text=f"{name} allowed to PM.", del_in=8)
 
 
 @bot.add_cmd(cmd="nopm")
@@ -139,10 +247,8 @@ async def no_pm(bot: BOT, message: Message):
     if user_id not in ALLOWED_USERS:
         await message.reply(f"{name} is not approved to PM.")
         return
-    ALLOWED_USERS.remove(user_id)
-    await asyncio.gather(
-        message.reply(text=f"{name} Dis-allowed to PM.", del_in=8), PM_USERS.delete_data(user_id)
-    )
+    set_allowed(user_id, allowed=False)
+    await message.reply(text=f"{name} Dis-allowed to PM.", del_in=8)
 
 
 def get_userID_name(message: Message) -> tuple:
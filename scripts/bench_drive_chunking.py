@@ -0,0 +1,104 @@
+"""
+Memory benchmark for the Drive upload chunk assembly.
+
+Feeds the same byte stream through the old `buffer += chunk` / `buffer = buffer[size:]`
+assembly and through Drive.rechunk with its BufferPool, and reports the bytes
+allocated per GiB, the tracemalloc peak and the time taken by each.
+
+Run from the repo root in the bot's environment:
+    python -m scripts.bench_drive_chunking --size 1024
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+from collections.abc import AsyncIterator
+
+from app.plugins.files.gdrive import BufferPool, Drive
+
+GIB = 1073741824
+
+
+async def fake_source(total: int, seed: int) -> AsyncIterator[memoryview]:
+    """Yield total bytes in the uneven pieces a socket hands out, without allocating them."""
+    rng = random.Random(seed)
+    block = memoryview(os.urandom(1048576))
+    sent = 0
+    while sent < total:
+        size = min(rng.randint(16384, len(block)), total - sent)
+        yield block[:size]
+        sent += size
+
+
+async def old_assembly(total: int, chunk_size: int, seed: int) -> int:
+    """:return: bytes allocated by the bytes concatenation and slicing."""
+    allocated = 0
+    buffer = b""
+
+    async for data in fake_source(total, seed):
+        buffer += data
+        allocated += len(buffer)
+        if len(buffer) < chunk_size:
+            continue
+        chunk = buffer[:chunk_size]
+        buffer = buffer[chunk_size:]
+        allocated += len(chunk) + len(buffer)
+
+    return allocated
+
+
+async def new_assembly(total: int, seed: int) -> int:
+    """:return: bytes allocated for the pool's backing bytearrays."""
+    drive = Drive()
+    sizer = drive.get_chunk_sizer()
+    pool = BufferPool(
+        count=drive.BUFFER_DEPTH,
+        size=sizer.size,
+        limit=drive.READ_AHEAD_LIMIT,
+        alignment=drive.CHUNK_ALIGNMENT,
+    )
+    allocated = pool.allocated
+    capacities: dict[int, int] = {}
+
+    async for buffer in drive.rechunk(fake_source(total, seed), sizer, pool):
+        # A bigger capacity than last time means reset() swapped in a new bytearray.
+        if capacities.get(id(buffer), buffer.capacity) != buffer.capacity:
+            allocated += buffer.capacity
+        capacities[id(buffer)] = buffer.capacity
+        # Stands in for the PUT, the buffer is free again once it is sent.
+        pool.put(buffer)
+
+    return allocated
+
+
+async def measure(name: str, coro, total: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    allocated = await coro
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<6} allocated: {allocated / total * GIB / 1048576:>10.1f} MiB per GiB"
+        f" | peak: {peak / 1048576:>7.1f} MiB | {total / 1048576 / seconds:>8.1f} MiB/s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--size", type=int, default=1024, help="MiB to push through (1024)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    total = args.size * 1048576
+    print(f"Assembling {args.size} MiB into {Drive.CHUNK_SIZE // 1024} KiB chunks")
+    await measure("before", old_assembly(total, Drive.CHUNK_SIZE, args.seed), total)
+    await measure("after", new_assembly(total, args.seed), total)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
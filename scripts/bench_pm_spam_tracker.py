@@ -0,0 +1,97 @@
+"""
+Benchmark for the PM guard's spam tracking under a spam wave.
+
+Sends messages from 100k distinct users, round robin and in bursts, through SpamTracker
+and through the old never-decaying defaultdict(int) counter, and reports time per message,
+users kept in memory and the tracemalloc peak of each.
+
+Run from the repo root in the bot's environment:
+    python -m scripts.bench_pm_spam_tracker --users 100000 --messages 3
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Iterator
+
+from app.plugins.tg_tools.pm_permit import SpamTracker
+
+
+def message_order(users: int, messages: int, burst: bool) -> Iterator[int]:
+    """Sender of every message, each spammer in one go or all of them round after round."""
+    if burst:
+        return (user_id for user_id in range(users) for _ in range(messages))
+    return (user_id for _ in range(messages) for user_id in range(users))
+
+
+def run_old(senders: Iterator[int], threshold: int) -> tuple[int, int]:
+    """:return: users kept and users flagged by the old counter."""
+    recent_users: defaultdict[int, int] = defaultdict(int)
+    flagged = 0
+    for user_id in senders:
+        recent_users[user_id] += 1
+        if recent_users[user_id] == threshold:
+            flagged += 1
+    return len(recent_users), flagged
+
+
+def run_new(senders: Iterator[int], tracker: SpamTracker) -> tuple[int, int]:
+    """:return: users kept and users flagged by the tracker."""
+    flagged = 0
+    for user_id in senders:
+        if tracker.hit(user_id) == tracker.threshold:
+            flagged += 1
+    return len(tracker), flagged
+
+
+def measure(name: str, run, total: int):
+    """Time a run, then repeat it under tracemalloc for the memory peak."""
+    start = time.perf_counter()
+    kept, flagged = run()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<6} {seconds / total * 1e6:>6.2f} µs/message | {kept:>7} users kept"
+        f" | {flagged:>7} flagged | peak: {peak / 1048576:>6.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--users", type=int, default=100000, help="distinct spammers (100000)")
+    parser.add_argument("--messages", type=int, default=3, help="messages per spammer (3)")
+    parser.add_argument("--window", type=float, default=60, help="tracker window in s (60)")
+    parser.add_argument("--threshold", type=int, default=3, help="messages to flag (3)")
+    parser.add_argument("--max-users", type=int, default=10000, help="tracker size (10000)")
+    args = parser.parse_args()
+
+    total = args.users * args.messages
+
+    for burst in (False, True):
+        print(
+            f"{args.users} spammers x {args.messages} messages,"
+            f" {'each in a burst' if burst else 'round robin'}"
+        )
+        measure(
+            "before",
+            lambda: run_old(message_order(args.users, args.messages, burst), args.threshold),
+            total=total,
+        )
+        measure(
+            "after",
+            lambda: run_new(
+                message_order(args.users, args.messages, burst),
+                SpamTracker(window=args.window, threshold=args.threshold, max_users=args.max_users),
+            ),
+            total=total,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Throughput benchmark for Telegram to Drive uploads.
+
+Serves a fake resumable Drive endpoint on localhost and feeds it from a fake media stream
+that yields 1 MiB parts at Telegram's pace. Compares the old loop, which PUT each part
+before reading the next, with Drive.pipe_to_drive, which reads ahead while a chunk is sent.
+
+Run from the repo root in the bot's environment:
+    python -m scripts.bench_tg_to_drive --size 256 --tg-speed 20 --drive-speed 20
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import AsyncIterator
+
+import aiohttp
+from aiohttp import web
+from google.oauth2.credentials import Credentials
+
+from app.plugins.files.gdrive import TG_STREAM_CHUNK_SIZE, Drive
+
+
+class FakeDrive:
+    """Resumable upload endpoint that stores nothing and reads bodies at a fixed speed."""
+
+    def __init__(self, speed: float, latency: float):
+        self.speed = speed
+        self.latency = latency
+        self.committed: dict[str, int] = {}
+        self.puts = 0
+
+    async def handle_put(self, request: web.Request) -> web.Response:
+        upload_id = request.match_info["upload_id"]
+        span, total = request.headers["Content-Range"].removeprefix("bytes ").split("/")
+        self.puts += 1
+
+        await asyncio.sleep(self.latency)
+        start = time.perf_counter()
+        received = 0
+        async for data in request.content.iter_any():
+            received += len(data)
+            # Hold the connection for as long as the link would take to carry it.
+            await asyncio.sleep(max(received / self.speed - (time.perf_counter() - start), 0))
+
+        offset = int(span.split("-")[0])
+        if offset != (expected := self.committed.get(upload_id, 0)):
+            return web.Response(status=400, text=f"Expected offset {expected}")
+
+        self.committed[upload_id] = offset + received
+        if self.committed[upload_id] == int(total):
+            return web.json_response({"id": upload_id})
+        return web.Response(status=308, headers={"Range": f"bytes=0-{offset + received - 1}"})
+
+
+async def fake_media_stream(total: int, speed: float) -> AsyncIterator[bytes]:
+    """Yield total bytes in stream_media sized parts, as fast as speed bytes/s allows."""
+    part = bytes(TG_STREAM_CHUNK_SIZE)
+    sent = 0
+    while sent < total:
+        size = min(len(part), total - sent)
+        await asyncio.sleep(size / speed)
+        yield part[:size]
+        sent += size
+
+
+async def sequential_upload(drive: Drive, location: str, total: int, tg_speed: float) -> str:
+    """The old _upload_from_telegram loop, the next part is read only after the PUT returns."""
+    start = 0
+    file_id = None
+    async for chunk in fake_media_stream(total, tg_speed):
+        end = start + len(chunk) - 1
+        headers = {
+            "Content-Range": f"bytes {start}-{end}/{total}",
+            "Authorization": f"Bearer {await drive.get_token()}",
+        }
+        file_id = await drive.upload_chunk(location, headers, chunk)
+        start = end + 1
+    return file_id
+
+
+async def piped_upload(drive: Drive, location: str, total: int, tg_speed: float) -> str:
+    session = {"key": location, "location": location, "offset": 0, "size": total}
+    return await drive.pipe_to_drive(
+        source=fake_media_stream(total, tg_speed), session=session, store={"uploaded_size": 0}
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--size", type=int, default=256, help="MiB to upload (256)")
+    parser.add_argument("--tg-speed", type=float, default=20, help="Telegram MiB/s (20)")
+    parser.add_argument("--drive-speed", type=float, default=20, help="Drive MiB/s (20)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Drive PUT latency s (0.05)")
+    args = parser.parse_args()
+
+    total = args.size * 1048576
+    fake_drive = FakeDrive(speed=args.drive_speed * 1048576, latency=args.latency)
+
+    app = web.Application(client_max_size=Drive.MAX_CHUNK_SIZE * 2)
+    app.router.add_put("/upload/{upload_id}", fake_drive.handle_put)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    drive = Drive()
+    drive.creds = Credentials(token="bench")
+    drive._aiohttp_session = aiohttp.ClientSession()
+
+    print(
+        f"{args.size} MiB, Telegram {args.tg_speed} MiB/s, Drive {args.drive_speed} MiB/s"
+        f" with {args.latency * 1000:.0f} ms per PUT"
+    )
+    try:
+        for name, upload in (("before", sequential_upload), ("after", piped_upload)):
+            puts = fake_drive.puts
+            start = time.perf_counter()
+            file_id = await upload(
+                drive, f"http://127.0.0.1:{port}/upload/{name}", total, args.tg_speed * 1048576
+            )
+            seconds = time.perf_counter() - start
+            assert file_id == name, f"{name} upload didn't finish: {file_id}"
+            print(
+                f"{name:<6} {seconds:>7.2f}s | {args.size / seconds:>6.1f} MiB/s"
+                f" | {fake_drive.puts - puts} PUTs"
+            )
+    finally:
+        await drive._aiohttp_session.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())